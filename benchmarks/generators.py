@@ -0,0 +1,121 @@
+"""Deterministic synthetic data for the benchmarks."""
+
+import json
+import random
+import string
+from pathlib import Path
+from typing import Any
+
+# Themes per style group.
+GROUP_SIZE = 10
+
+_WORDS = [
+    "".join(random.Random(i).choices(string.ascii_lowercase, k=3 + i % 8))
+    for i in range(512)
+]
+_WIDGETS = [
+    "QWidget",
+    "QMainWindow",
+    "QPushButton",
+    "QLabel",
+    "QLineEdit",
+    "QComboBox",
+    "QListView",
+    "QTextBrowser",
+    "QMenu",
+    "QMenu::item",
+    "QScrollBar:vertical",
+    "QToolTip",
+]
+_PROPERTIES = [
+    "color",
+    "background-color",
+    "border",
+    "border-radius",
+    "padding",
+    "margin",
+    "font-size",
+    "selection-background-color",
+]
+
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choices(_WORDS, k=n))
+
+
+def _value(rng: random.Random, i: int) -> Any:
+    kind = i % 6
+    if kind == 0:
+        return rng.randint(-(10**6), 10**6)
+    if kind == 1:
+        return rng.random()
+    if kind == 2:
+        return rng.random() < 0.5
+    if kind == 3:
+        return _words(rng, rng.randint(1, 8))
+    if kind == 4:
+        return [rng.randint(0, 100) for _ in range(rng.randint(0, 10))]
+    return {f"k{j}": _words(rng, 2) for j in range(rng.randint(0, 5))}
+
+
+def make_config(n: int, seed: int = 0) -> dict[str, Any]:
+    """Return a default config with `n` keys of mixed JSON types."""
+    rng = random.Random(seed)
+    return {f"key_{i:05d}": _value(rng, i) for i in range(n)}
+
+
+def make_stylesheet(rng: random.Random, rules: int = 40) -> str:
+    lines = []
+    for _ in range(rules):
+        lines.append(f"{rng.choice(_WIDGETS)} {{")
+        for prop in rng.sample(_PROPERTIES, rng.randint(1, 4)):
+            lines.append(f"    {prop}: #{rng.randrange(0x1000000):06x};")
+        lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def make_styles(root: Path, n: int, seed: int = 0) -> None:
+    """
+    Create a styles directory below `root` with `n` themes in groups of
+    `GROUP_SIZE`.
+    """
+    rng = random.Random(seed)
+    for i in range(n):
+        theme = root / f"group-{i // GROUP_SIZE:04d}" / f"theme-{i:05d}"
+        theme.mkdir(parents=True)
+        (theme / "stylesheet.qss").write_text(
+            make_stylesheet(rng), encoding="utf-8"
+        )
+
+
+def make_licenses(root: Path, n: int, seed: int = 0) -> None:
+    """
+    Create `n` licenses below `root`, each a .json file referencing a .txt
+    file.
+    """
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        name = f"package-{i:05d}"
+        (root / f"{name}.txt").write_text(
+            "\n\n".join(
+                _words(rng, rng.randint(40, 120))
+                for _ in range(rng.randint(3, 12))
+            ),
+            encoding="utf-8",
+        )
+        (root / f"{name}.json").write_text(
+            json.dumps(
+                {
+                    "name": f"Package {_words(rng, 2).title()} {i}",
+                    "content_file": f"{name}.txt",
+                    "link": f"https://example.org/{name}",
+                }
+            ),
+            encoding="utf-8",
+        )
+
+
+def make_log_messages(n: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [_words(rng, rng.randint(3, 20)) for _ in range(n)]
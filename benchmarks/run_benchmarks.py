@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the pyqt_utils core operations.
+
+Every case runs in a fresh interpreter with its own temporary application
+directory and the offscreen Qt platform, so the cases don't influence each
+other. Results are written to a JSON file and can be compared against a
+previous run:
+
+    python benchmarks/run_benchmarks.py --output before.json
+    python benchmarks/run_benchmarks.py --compare before.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import generators
+
+REPO_PATH = Path(__file__).resolve().parent.parent
+SIZES = [10, 100, 1000, 10_000]
+THREADS = [1, 2, 4, 8]
+
+
+def _measure(
+    run: Callable[[int], object], number: int, repeat: int
+) -> dict[str, Any]:
+    """
+    Time `run(number)`, which performs `number` operations, `repeat` times.
+
+    :return: The time per operation in microseconds.
+    :rtype: dict[str, Any]
+    """
+    run(min(number, 10))
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter_ns()
+            run(number)
+            times.append((time.perf_counter_ns() - start) / number / 1000)
+        finally:
+            gc.enable()
+    median = statistics.median(times)
+    return {
+        "unit": "us",
+        "number": number,
+        "repeat": repeat,
+        "median": median,
+        "min": min(times),
+        "max": max(times),
+        "ops_per_sec": 1e6 / median if median else None,
+    }
+
+
+def bench_config_get(root: Path, size: int, repeat: int) -> dict[str, Any]:
+    from pyqt_utils import config
+
+    default = generators.make_config(size)
+    config.init_config(default)
+    keys = list(default)
+    sequence = [keys[i % size] for i in range(20_000)]
+
+    def run(n: int) -> None:
+        for key in sequence[:n]:
+            config.get_config_value(key)
+
+    return _measure(run, len(sequence), repeat)
+
+
+def bench_config_set(root: Path, size: int, repeat: int) -> dict[str, Any]:
+    from pyqt_utils import config
+
+    default = generators.make_config(size)
+    config.init_config(default)
+    keys = list(default)
+    counter = iter(range(10**9))
+
+    def run(n: int) -> None:
+        for i in range(n):
+            config.set_config_value(keys[i % size], next(counter))
+
+    return _measure(run, 20_000, repeat)
+
+
+def bench_config_flush(root: Path, size: int, repeat: int) -> dict[str, Any]:
+    from pyqt_utils import config
+
+    default = generators.make_config(size)
+    config.init_config(default, write_delay=3600)
+    keys = list(default)
+    counter = iter(range(10**9))
+
+    def run(n: int) -> None:
+        for i in range(n):
+            config.set_config_value(keys[i % size], next(counter))
+            config.flush_config()
+
+    return _measure(run, 50, repeat)
+
+
+def bench_log(root: Path, threads: int, repeat: int) -> dict[str, Any]:
+    """Log messages from `threads` threads, including the final flush."""
+    from pyqt_utils import config
+
+    config.init_config({})
+    messages = generators.make_log_messages(1000)
+
+    def log_messages(n: int) -> None:
+        for i in range(n):
+            config.log("%s", "INFO", messages[i % len(messages)])
+
+    def run(n: int) -> None:
+        workers = [
+            threading.Thread(target=log_messages, args=(n // threads,))
+            for _ in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        config.flush_log()
+
+    return _measure(run, 40_000, repeat)
+
+
+def bench_find_styles(root: Path, size: int, repeat: int) -> dict[str, Any]:
+    """Find the styles again, reusing the index of the previous call."""
+    generators.make_styles(root / "styles", size)
+    from pyqt_utils.styles import find_styles
+
+    return _measure(lambda n: [find_styles() for _ in range(n)], 1, repeat)
+
+
+def bench_find_styles_cold(
+    root: Path, size: int, repeat: int
+) -> dict[str, Any]:
+    """Find the styles by scanning the styles directory, without an index."""
+    generators.make_styles(root / "styles", size)
+    from pyqt_utils import config, styles
+
+    config.init_config({}, create_lib_dir=True)
+
+    def run(n: int) -> None:
+        for _ in range(n):
+            styles._index = None
+            styles._styles = {}
+            styles._index_path().unlink(missing_ok=True)
+            styles.find_styles()
+
+    return _measure(run, 1, repeat)
+
+
+def bench_find_licenses(
+    root: Path, size: int, repeat: int
+) -> dict[str, Any]:
+    generators.make_licenses(root / "licenses", size)
+    from pyqt_utils.licenses import find_licenses
+
+    return _measure(lambda n: [find_licenses() for _ in range(n)], 1, repeat)
+
+
+def bench_license_viewer(
+    root: Path, size: int, repeat: int
+) -> dict[str, Any]:
+    generators.make_licenses(root / "licenses", size)
+    from PyQt6.QtWidgets import QApplication, QWidget
+
+    from pyqt_utils.licenses import LicenseViewer
+
+    app = QApplication([])
+    parent = QWidget()
+
+    def run(n: int) -> None:
+        for _ in range(n):
+            viewer = LicenseViewer(parent)
+            viewer.setParent(None)
+
+    result = _measure(run, 1, repeat)
+    parent.deleteLater()
+    app.processEvents()
+    return result
+
+
+BENCHMARKS: dict[
+    str, tuple[list[int], Callable[[Path, int, int], dict[str, Any]]]
+] = {
+    "config_get": (SIZES, bench_config_get),
+    "config_set": (SIZES, bench_config_set),
+    "config_flush": (SIZES, bench_config_flush),
+    "log": (THREADS, bench_log),
+    "find_styles": (SIZES, bench_find_styles),
+    "find_styles_cold": (SIZES, bench_find_styles_cold),
+    "find_licenses": (SIZES, bench_find_licenses),
+    "license_viewer": (SIZES[:3], bench_license_viewer),
+}
+
+
+def worker(name: str, param: int, repeat: int) -> None:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, str(REPO_PATH))
+    with tempfile.TemporaryDirectory(prefix="pyqt-utils-bench-") as tmp:
+        os.environ["HOME"] = os.environ["XDG_DATA_HOME"] = tmp
+        os.environ["APPDATA"] = os.environ["LOCALAPPDATA"] = tmp
+        root = Path(tmp) / "bench"
+        root.mkdir()
+        (root / "version.txt").write_text("1.0.0", encoding="utf-8")
+        from pyqt_utils import init_app
+
+        init_app("PyQt-Utils-Bench", str(root / "__init__.py"))
+        result = BENCHMARKS[name][1](root, param, repeat)
+        from pyqt_utils import config
+
+        config.flush_config()
+        config.flush_log()
+    print(json.dumps(result))
+
+
+def _metadata() -> dict[str, Any]:
+    from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR
+
+    sys.path.insert(0, str(REPO_PATH))
+    from pyqt_utils import pyqt_tools_version
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPO_PATH,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "pyqt_utils": pyqt_tools_version,
+        "python": platform.python_version(),
+        "pyqt": PYQT_VERSION_STR,
+        "qt": QT_VERSION_STR,
+        "platform": platform.platform(),
+    }
+
+
+def _compare(
+    results: list[dict[str, Any]], baseline_path: str, threshold: float
+) -> list[str]:
+    baseline = {
+        (result["name"], result["param"]): result
+        for result in json.loads(
+            Path(baseline_path).read_text("utf-8")
+        )["results"]
+    }
+    regressions = []
+    for result in results:
+        before = baseline.get((result["name"], result["param"]))
+        if before is None:
+            continue
+        ratio = result["median"] / before["median"]
+        print(
+            f"{result['name']:<16} {result['param']:>6} "
+            f"{before['median']:12.2f} -> {result['median']:12.2f} us "
+            f"({ratio:.2f}x)"
+        )
+        if ratio > 1 + threshold / 100:
+            regressions.append(f"{result['name']}[{result['param']}]")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pyqt_utils core operations."
+    )
+    parser.add_argument(
+        "--output",
+        default="benchmark-results.json",
+        help="The JSON file to write the results to. Defaults to "
+             "benchmark-results.json.",
+    )
+    parser.add_argument(
+        "--filter",
+        action="append",
+        help="Only run benchmarks whose name contains this text.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="The number of measurements per benchmark. Defaults to 5.",
+    )
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Only run the two smallest sizes of every benchmark.",
+    )
+    parser.add_argument(
+        "--compare",
+        help="Compare the results against a previously written JSON file "
+             "and fail if a benchmark got slower than --threshold.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=20.0,
+        help="The slowdown in percent tolerated by --compare. Defaults to "
+             "20.",
+    )
+    parser.add_argument("--worker", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker[0], int(args.worker[1]), args.repeat)
+        return
+
+    results = []
+    for name, (params, _) in BENCHMARKS.items():
+        if args.filter and not any(text in name for text in args.filter):
+            continue
+        for param in params[:2] if args.quick else params:
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--worker",
+                    name,
+                    str(param),
+                    "--repeat",
+                    str(args.repeat),
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if process.returncode:
+                print(f"{name} [{param}] failed:\n{process.stderr}")
+                sys.exit(1)
+            result = {
+                "name": name,
+                "param": param,
+                **json.loads(process.stdout.splitlines()[-1]),
+            }
+            results.append(result)
+            print(
+                f"{name:<16} {param:>6} {result['median']:12.2f} us "
+                f"(min {result['min']:.2f}, max {result['max']:.2f})"
+            )
+
+    Path(args.output).write_text(
+        json.dumps({"metadata": _metadata(), "results": results}, indent=2),
+        encoding="utf-8",
+    )
+    if args.compare:
+        print()
+        regressions = _compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\nRegressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,25 @@
+import os
+
 try:
     from . import app_conf
 except ImportError:
     import app_conf  # type: ignore[no-redef]
 
+# Set by `pyqt-utils --profile-startup`, see `pyqt_utils.startup_profile`.
+_profile_startup = bool(os.environ.get("PYQT_UTILS_STARTUP_PROFILE"))
+if _profile_startup:
+    try:
+        from . import startup_profile
+    except ImportError:
+        import startup_profile  # type: ignore[no-redef]
+
+    startup_profile.install()
+
 
 def init_app(name: str, root_file: str) -> None:
     """
     Provide information required by pyqt-utils modules.
-    This function must be called before import the config or paths modules.
+    This function must be called before using the config or paths modules.
 
     :param name: The name, must conform to file system rules.
     :type name: str
@@ -17,6 +29,8 @@ def init_app(name: str, root_file: str) -> None:
     """
     app_conf.app_name = name
     app_conf.root_file = root_file
+    if _profile_startup:
+        startup_profile.mark("init_app")
 
 
 pyqt_tools_version = "1.0.0"
@@ -1,8 +1,13 @@
 import argparse
 import os
 import platform
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from textwrap import dedent
+from xml.etree import ElementTree
 
 
 def _find_executable(name: str) -> str:
@@ -15,6 +20,19 @@ def _find_executable(name: str) -> str:
     return name
 
 
+def _qrc_files(qrc_file: Path) -> list[Path]:
+    """Return the files listed in a .qrc file."""
+    try:
+        tree = ElementTree.parse(qrc_file)
+    except (OSError, ElementTree.ParseError):
+        return []
+    return [
+        qrc_file.parent / element.text
+        for element in tree.iter("file")
+        if element.text
+    ]
+
+
 def main() -> None:
     from pyqt_utils import pyqt_tools_version
 
@@ -50,6 +68,69 @@ def main() -> None:
         help="Compile the icons/icons.qrc file to a resource.py file.",
     )
 
+    parser.add_argument(
+        "--compile-icons-rcc",
+        action="store_true",
+        dest="compile_icons_rcc",
+        help="Generate a .qrc file from all files in the icons/ directory "
+             "and compile it to a binary icons/icons.rcc file. Register it "
+             "using pyqt_utils.icons.register_icon_resources().",
+    )
+
+    parser.add_argument(
+        "--rcc-compress-algo",
+        action="store",
+        choices=["zstd", "zlib", "none"],
+        default="zstd",
+        dest="rcc_compress_algo",
+        help="The compression algorithm for --compile-icons-rcc. Defaults "
+             "to zstd, use zlib if rcc wasn't built with zstd support.",
+    )
+
+    parser.add_argument(
+        "--rcc-threshold",
+        action="store",
+        type=int,
+        default=70,
+        dest="rcc_threshold",
+        help="Only compress files for --compile-icons-rcc if that saves at "
+             "least this many percent of their size. Defaults to 70.",
+    )
+
+    parser.add_argument(
+        "--compile-styles",
+        action="store_true",
+        dest="compile_styles",
+        help="Compile all stylesheets in the styles/ directory into the "
+             "cache/ folders of their groups.",
+    )
+
+    parser.add_argument(
+        "--collect-licenses",
+        action="store_true",
+        dest="collect_licenses",
+        help="Write the licenses of all installed distributions to the "
+             "licenses/ directory. Only added, updated and removed "
+             "distributions are processed again.",
+    )
+
+    parser.add_argument(
+        "--collect-licenses-exclude",
+        action="append",
+        dest="collect_licenses_exclude",
+        help="Leave out this distribution when collecting licenses, e.g. "
+             "build tools. Can be passed multiple times.",
+    )
+
+    parser.add_argument(
+        "--index-licenses",
+        action="store_true",
+        dest="index_licenses",
+        help="Build the search index of the licenses/ directory, so the "
+             "LicenseViewer doesn't have to build it at runtime. Implied by "
+             "--collect-licenses.",
+    )
+
     parser.add_argument(
         "--update-langs",
         action="store_true",
@@ -69,7 +150,9 @@ def main() -> None:
         "--compile-langs",
         action="store_true",
         dest="compile_langs",
-        help="Compile all .ts files in the langs/ directory to .qm files.",
+        help="Compile the .ts files in the langs/ directory to .qm files. "
+             ".ts files that didn't change since their .qm file was built "
+             "are skipped.",
     )
 
     parser.add_argument(
@@ -124,6 +207,65 @@ def main() -> None:
              "source=dest.",
     )
 
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        dest="profile_startup",
+        help="Start the package several times, cold and warm, and report "
+             "slow imports and init phases up to the first shown window.",
+    )
+
+    parser.add_argument(
+        "--profile-runs",
+        action="store",
+        type=int,
+        default=5,
+        dest="profile_runs",
+        help="The number of cold and warm runs for --profile-startup. "
+             "Defaults to 5.",
+    )
+
+    parser.add_argument(
+        "--profile-save",
+        action="store",
+        dest="profile_save",
+        help="Save the --profile-startup report to this JSON file.",
+    )
+
+    parser.add_argument(
+        "--profile-baseline",
+        action="store",
+        dest="profile_baseline",
+        help="Compare the --profile-startup report against a report saved "
+             "using --profile-save and fail if startup regressed.",
+    )
+
+    parser.add_argument(
+        "--profile-threshold",
+        action="store",
+        type=float,
+        default=10.0,
+        dest="profile_threshold",
+        help="The startup slowdown in percent tolerated by "
+             "--profile-baseline. Defaults to 10.",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        dest="force",
+        help="Run the compile, update and index steps even if their outputs "
+             "are up to date.",
+    )
+
+    parser.add_argument(
+        "--explain",
+        action="store_true",
+        dest="explain",
+        help="Print why every target of the compile, update and index steps "
+             "is built or considered up to date.",
+    )
+
     parser.set_defaults(func=lambda _: parser.print_help())
 
     args = parser.parse_args()
@@ -134,49 +276,265 @@ def main() -> None:
 
     package = Path(args.package).resolve()
 
+    from pyqt_utils.scripts.build_cache import BuildCache
+
+    # Only the outdated targets of the steps below are built.
+    cache = BuildCache(package, force=args.force, explain=args.explain)
+    own_version = f"pyqt-utils {pyqt_tools_version}"
+
     if args.compile_ui:
-        for ui_file in package.rglob("ui/*.ui"):
+        pyuic6 = _find_executable("pyuic6")
+        pyuic6_version = cache.tool_version(pyuic6, "--version")
+        for ui_file in sorted(package.rglob("ui/*.ui")):
             if not ui_file.is_file():
                 continue
-            os.system(
-                f"{_find_executable("pyuic6")} {ui_file} -o "
-                f"{ui_file.with_suffix('.py').with_stem(
-                    ui_file.stem + "_ui"
-                )}"
+            py_file = ui_file.with_suffix(".py").with_stem(
+                ui_file.stem + "_ui"
+            )
+            cache.run(
+                f"compile-ui:{ui_file.relative_to(package).as_posix()}",
+                [ui_file],
+                [py_file],
+                lambda: subprocess.run(
+                    [pyuic6, str(ui_file), "-o", str(py_file)], check=True
+                ),
+                pyuic6_version,
             )
 
     if args.compile_icons:
-        os.system(
-            f"{_find_executable("rcc")} --generator python "
-            f"{package}/icons/icons.qrc -o "
-            f"{package}/icons/resource.py"
+        rcc = _find_executable("rcc")
+        qrc_file = package / "icons" / "icons.qrc"
+        resource_file = package / "icons" / "resource.py"
+
+        def compile_icons() -> None:
+            subprocess.run(
+                [
+                    rcc,
+                    "--generator",
+                    "python",
+                    str(qrc_file),
+                    "-o",
+                    str(resource_file),
+                ],
+                check=True,
+            )
+            resource_file.write_text(
+                resource_file.read_text("utf-8").replace(
+                    "PyQt5", "PyQt6").replace("PySide2", "PyQt6").replace(
+                        "PySide6", "PyQt6"),
+                encoding="utf-8",
+            )
+
+        cache.run(
+            "compile-icons",
+            [qrc_file, *_qrc_files(qrc_file)],
+            [resource_file],
+            compile_icons,
+            cache.tool_version(rcc, "--version"),
+        )
+
+    if args.compile_icons_rcc:
+        from pyqt_utils.icons import RCC_NAME, generate_qrc, icon_files
+
+        rcc = _find_executable("rcc")
+        rcc_file = package / "icons" / RCC_NAME
+
+        def compile_icons_rcc() -> None:
+            with tempfile.TemporaryDirectory() as tmp:
+                qrc_file = Path(tmp) / "icons.qrc"
+                qrc_file.write_text(
+                    generate_qrc(package / "icons"), encoding="utf-8"
+                )
+                subprocess.run(
+                    [
+                        rcc,
+                        "--binary",
+                        "--compress-algo",
+                        args.rcc_compress_algo,
+                        "--threshold",
+                        str(args.rcc_threshold),
+                        str(qrc_file),
+                        "-o",
+                        str(rcc_file),
+                    ],
+                    check=True,
+                )
+
+        cache.run(
+            "compile-icons-rcc",
+            icon_files(package / "icons"),
+            [rcc_file],
+            compile_icons_rcc,
+            cache.tool_version(rcc, "--version"),
+            [args.rcc_compress_algo, args.rcc_threshold],
         )
-        resource_file = Path(package) / "icons" / "resource.py"
-        resource_file.write_text(
-            resource_file.read_text("utf-8").replace(
-                "PyQt5", "PyQt6").replace("PySide2", "PyQt6").replace(
-                    "PySide6", "PyQt6"),
-            encoding="utf-8",
+
+    if args.compile_styles:
+        from pyqt_utils.styles import compile_styles, compiled_path
+
+        styles_path = package / "styles"
+        stylesheets = [
+            path
+            for path in sorted(styles_path.glob("*/*/stylesheet.qss"))
+            if "cache" not in path.parent.name
+        ]
+
+        def compile_all_styles() -> None:
+            for path in compile_styles(styles_path):
+                print(f"Compiled {path}")
+
+        cache.run(
+            "compile-styles",
+            [
+                path
+                for path in sorted(styles_path.rglob("*.qss"))
+                if path.parent.name != "cache"
+            ],
+            [
+                output
+                for path in stylesheets
+                for output in (
+                    compiled_path(path),
+                    compiled_path(path).with_suffix(".deps"),
+                )
+            ],
+            compile_all_styles,
+            own_version,
+        )
+
+    if args.collect_licenses:
+        from pyqt_utils.scripts import collect_licenses
+
+        collect_licenses.main(
+            package / "licenses", args.collect_licenses_exclude or []
+        )
+
+    if args.collect_licenses or args.index_licenses:
+        from pyqt_utils.licenses import (
+            INDEX_NAME,
+            license_files,
+            write_search_index,
+        )
+
+        licenses_path = package / "licenses"
+        cache.run(
+            "index-licenses",
+            license_files(licenses_path),
+            [licenses_path / INDEX_NAME],
+            lambda: print(f"Wrote {write_search_index(licenses_path)}"),
+            own_version,
         )
 
     if args.update_langs:
-        lupdate_files = (
-            " ".join(args.lupdate_files) if args.lupdate_files else ""
+        lupdate = _find_executable("lupdate")
+        ts_files = sorted(
+            ts_file
+            for ts_file in package.rglob("langs/*.ts")
+            if ts_file.is_file()
         )
-        for ts_file in package.rglob("langs/*.ts"):
-            if not ts_file.is_file():
-                continue
-            os.system(
-                f"{_find_executable("lupdate")} -tr-function-alias "
-                f"translate=tr {lupdate_files} {package}/ui/ -ts "
-                f"{ts_file} -no-obsolete -source-language en_US"
+        lupdate_files = args.lupdate_files or []
+        if ts_files:
+            cache.run(
+                "update-langs",
+                [
+                    *(
+                        path
+                        for path in sorted((package / "ui").rglob("*"))
+                        if path.is_file()
+                    ),
+                    *map(Path, lupdate_files),
+                ],
+                ts_files,
+                # A single run parses the sources once for all languages.
+                lambda: subprocess.run(
+                    [
+                        lupdate,
+                        "-tr-function-alias",
+                        "translate=tr",
+                        *lupdate_files,
+                        f"{package}/ui/",
+                        "-ts",
+                        *map(str, ts_files),
+                        "-no-obsolete",
+                        "-source-language",
+                        "en_US",
+                    ],
+                    check=True,
+                ),
+                cache.tool_version(lupdate, "-version"),
+                lupdate_files,
             )
 
     if args.compile_langs:
-        for ts_file in package.rglob("langs/*.ts"):
-            if not ts_file.is_file():
-                continue
-            os.system(f"{_find_executable("lrelease")} {ts_file}")
+        lrelease = _find_executable("lrelease")
+        lrelease_version = cache.tool_version(lrelease, "-version")
+        ts_files = sorted(
+            ts_file
+            for ts_file in package.rglob("langs/*.ts")
+            if ts_file.is_file()
+        )
+        outdated = [
+            ts_file
+            for ts_file in ts_files
+            if cache.outdated(
+                f"compile-langs:{ts_file.relative_to(package).as_posix()}",
+                [ts_file],
+                [ts_file.with_suffix(".qm")],
+                lrelease_version,
+            )
+        ]
+
+        def compile_ts(ts_file: Path) -> subprocess.CompletedProcess[str]:
+            return subprocess.run(
+                [lrelease, str(ts_file)], capture_output=True, text=True
+            )
+
+        failed: list[subprocess.CompletedProcess[str]] = []
+        # Every job runs in its own lrelease process, the threads only wait
+        # for them.
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            for ts_file, process in zip(
+                outdated, executor.map(compile_ts, outdated)
+            ):
+                print(process.stdout, end="")
+                if process.returncode:
+                    failed.append(process)
+                    continue
+                # Warnings.
+                print(process.stderr, end="", file=sys.stderr)
+                cache.record(
+                    f"compile-langs:{ts_file.relative_to(package).as_posix()}",
+                    [ts_file],
+                    [ts_file.with_suffix(".qm")],
+                    lrelease_version,
+                )
+        print(
+            f"Compiled {len(outdated) - len(failed)} of {len(ts_files)} .ts "
+            "files"
+        )
+        if failed:
+            error = subprocess.CalledProcessError(
+                failed[0].returncode,
+                failed[0].args,
+                failed[0].stdout,
+                failed[0].stderr,
+            )
+            for process in failed:
+                error.add_note(process.stderr.rstrip())
+            raise error
+
+    if args.profile_startup:
+        from pyqt_utils.scripts import profile_startup
+
+        code = profile_startup.main(
+            package,
+            args.profile_runs,
+            args.profile_save,
+            args.profile_baseline,
+            args.profile_threshold,
+        )
+        if code:
+            sys.exit(code)
 
     build_command = dedent(
         f"""nuitka \
@@ -1,42 +1,108 @@
+import atexit
+import copy
+import gzip
+import io
 import json
+import os
 import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any
+from pathlib import Path
+from typing import Any, Literal, TextIO
 
 try:
-    from .app_conf import app_name
-    from .paths import CONFIG_DIR, CONFIG_PATH, LIB_DIR, LOGGER_PATH
-    from .version import version_string
+    from . import app_conf, paths, perf, version
 except ImportError:
-    from app_conf import app_name  # type: ignore[no-redef]
-    from paths import CONFIG_PATH  # type: ignore[no-redef]
-    from paths import (  # type: ignore[no-redef]
-        CONFIG_DIR,
-        LIB_DIR,
-        LOGGER_PATH,
-    )
-    from version import version_string  # type: ignore[no-redef]
+    import app_conf  # type: ignore[no-redef]
+    import paths  # type: ignore[no-redef]
+    import perf  # type: ignore[no-redef]
+    import version  # type: ignore[no-redef]
+
+# A burst of changes is written at most this many delays after its first
+# change, even if new changes keep arriving.
+MAX_WRITE_DELAY_FACTOR = 4
 
 _default_config: dict[str, Any] = {}
+_config: dict[str, Any] | None = None
+# Every change increments the generation; the config is dirty while it
+# differs from the last written generation.
+_generation = 0
+_written_generation = 0
+# Data already serialized for a generation and the keys it covers, reused
+# when writing that generation.
+_serialized: tuple[int, frozenset[str], Any] | None = None
+# Keys changed in this process that weren't written yet. They take
+# precedence over values loaded from a config file changed by another
+# process.
+_dirty_keys: set[str] = set()
+# Signature of the config files when they were last read or written by this
+# process, see `_file_signature`.
+_signature: Any = None
+# Optional QFileSystemWatcher. While it's active, the config file is only
+# checked for changes after it reported one.
+_watcher: Any = None
+_stale = False
+_listeners: list[Callable[[str, Any], None]] = []
+# Changed keys and their new values waiting to be passed to the listeners.
+_changes: list[tuple[str, Any]] = []
+# Guards the cached config. Held only briefly, never while doing file I/O.
+_lock = threading.RLock()
+# Serializes writes of the config file.
+_write_lock = threading.Lock()
+_writer: "_ConfigWriter | None" = None
+_local = threading.local()
 
 
 def config_exists() -> bool:
-    return CONFIG_PATH.exists()
+    return paths.CONFIG_PATH.exists() or paths.CONFIG_DB_PATH.exists()
 
 
 def trunc_log() -> None:
-    with open(LOGGER_PATH, "w") as fp:
-        fp.write("")
+    writer = _get_log_writer()
+    if writer is None:
+        with open(paths.LOGGER_PATH, "w") as fp:
+            fp.write("")
+    else:
+        writer.call(writer.truncate)
+
 
+def rotate_log() -> None:
+    """
+    Move the current log file to the compressed backups and start a new
+    one. Only the configured number of backups is kept.
+    """
+    writer = _get_log_writer()
+    if writer is None:
+        trunc_log()
+    else:
+        writer.call(writer.rotate)
 
+
+@perf.timed("config.init_config")
 def init_config(
     default_config: dict[str, Any],
     create_lib_dir: bool = False,
+    write_delay: float = 0.5,
+    watch_file: bool = False,
+    backend: Literal["json", "journal", "sqlite"] = "json",
+    journal_limit: int = 256 * 1024,
+    watchdog_threshold: float | None = None,
 ) -> None:
     """
     Create all necessary directories and files for config, logging and data
     storage.
 
+    The config is loaded once and then served from memory. Changes are
+    written to disk by a background thread after `write_delay` seconds
+    without further changes, and always when the application exits.
+
     :param default_config: A dictionary with all available config keys and
     their default values.
     :type default_config: dict[str, Any]
@@ -44,73 +110,1187 @@ def init_config(
     or downloaded files that do not need to be in a possibly synched config
     folder, defaults to False
     :type create_lib_dir: bool, optional
+    :param write_delay: Seconds to wait for further changes before writing
+    the config file, defaults to 0.5
+    :type write_delay: float, optional
+    :param watch_file: Use a QFileSystemWatcher to detect changes made to the
+    config file by other processes instead of checking its modification time
+    on every access. Requires a QCoreApplication instance, defaults to False
+    :type watch_file: bool, optional
+    :param backend: How the config is stored. "json" rewrites the config
+    file on every write. "journal" appends only the changed values to a
+    journal file and merges it back into the config file once the journal
+    grows larger than `journal_limit` bytes. "sqlite" stores every key in
+    its own row of an SQLite database, reading keys only when they're first
+    accessed and writing only changed keys. An existing config file is
+    migrated into the database once, defaults to "json"
+    :type backend: str, optional
+    :param journal_limit: Size in bytes at which the journal is compacted,
+    defaults to 256 KiB
+    :type journal_limit: int, optional
+    :param watchdog_threshold: Start a StallWatchdog (see
+    `pyqt_utils.stall_watchdog`) logging every time the event loop of the
+    calling thread doesn't process events for this many seconds, defaults
+    to None
+    :type watchdog_threshold: float | None, optional
     """
-    global _default_config
+    global _default_config, _config, _writer, _store
+    if backend == "json":
+        store = _JsonStore(paths.CONFIG_PATH)
+    elif backend == "journal":
+        store = _JournalStore(
+            paths.CONFIG_PATH, paths.CONFIG_JOURNAL_PATH, journal_limit
+        )
+    elif backend == "sqlite":
+        store = _SqliteStore(paths.CONFIG_DB_PATH)
+    else:
+        raise ValueError(f"Unknown config backend {backend!r}")
     _default_config = default_config
-    CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+    paths.CONFIG_DIR.mkdir(parents=True, exist_ok=True)
     if create_lib_dir:
-        LIB_DIR.mkdir(parents=True, exist_ok=True)
-    trunc_log()
+        paths.LIB_DIR.mkdir(parents=True, exist_ok=True)
+    rotate_log()
+
+    flush_config()
+    with _file_lock():
+        store.create(default_config)
+        if backend == "json" and paths.CONFIG_JOURNAL_PATH.exists():
+            # Left over from running in journal mode.
+            journal = _JournalStore(
+                paths.CONFIG_PATH, paths.CONFIG_JOURNAL_PATH, journal_limit
+            )
+            _write_atomic(paths.CONFIG_PATH, json.dumps(journal.load()))
+            paths.CONFIG_JOURNAL_PATH.unlink()
 
-    if not config_exists():
-        with open(CONFIG_PATH, "w", encoding="utf-8") as fp:
-            json.dump(default_config, fp)
+    with _lock:
+        _store = store
+        _config = _load_config()
+    if watch_file:
+        watch_config_file()
+    if _writer is None:
+        _writer = _ConfigWriter(write_delay)
+        _writer.start()
+        atexit.register(_shutdown_writer)
+    else:
+        _writer.delay = write_delay
 
-    log(f"{app_name} - Version {version_string}")
+    log(f"{app_conf.app_name} - Version {version.version_string}")
     log(f"Running on {platform.platform()}")
 
+    if watchdog_threshold is not None:
+        try:
+            from .stall_watchdog import start_watchdog
+        except ImportError:
+            from stall_watchdog import (  # type: ignore[no-redef]
+                start_watchdog,
+            )
 
-def _get_config() -> dict[str, Any]:
-    with open(CONFIG_PATH, "r", encoding="utf-8") as fp:
-        text = fp.read()
+        start_watchdog(watchdog_threshold)
+
+
+def _file_signature(path: Path) -> tuple[int, int, int] | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _load_config() -> dict[str, Any]:
+    """Read the config and remember its signature. Hold `_lock`."""
+    global _signature
+    # Taken before reading, so a concurrent change can only cause another
+    # reload but is never missed.
+    _signature = _store.signature()
+    if _store.lazy:
+        # Keys are loaded and reconciled on first access.
+        return {}
     try:
-        conf: dict[str, Any] = json.loads(text)
-    except json.JSONDecodeError as e:
+        with perf.span("config.load"):
+            conf = _store.load()
+    except ValueError as e:
         log(f"Failed to decode configuration file: {e}", "ERROR")
         log("Creating new config")
-        conf = _default_config
+        conf = copy.deepcopy(_default_config)
     for key in conf.copy():
         if key not in _default_config:
             del conf[key]
     for key in _default_config:
         if key not in conf:
-            conf[key] = _default_config[key]
+            conf[key] = copy.deepcopy(_default_config[key])
     return conf
 
 
-def _overwrite_config(config: dict[str, Any]) -> None:
+def _get_config() -> dict[str, Any]:
+    """
+    Return the cached config, loading it on first use and reloading it if
+    the config file was changed by another process. Hold `_lock`.
+    """
+    global _config
+    if _config is None:
+        _config = _load_config()
+    else:
+        _refresh()
+    return _config
+
+
+def _refresh(force: bool = False) -> bool:
+    """
+    Reload the config if the config file changed since this process last
+    read or wrote it. Changes that weren't written yet are kept. Hold
+    `_lock`.
+
+    :param force: Check the file even if the watcher didn't report a change,
+    defaults to False
+    :type force: bool, optional
+    :return: Whether the config was reloaded.
+    :rtype: bool
+    """
+    global _config, _stale
+    if _config is None or (_watcher is not None and not _stale and not force):
+        return False
+    _stale = False
+    if _store.signature() == _signature:
+        return False
+    perf.count("config.reloads")
+    old = _config
+    _config = _load_config()
+    for key in _dirty_keys:
+        if key in old:
+            _config[key] = old[key]
+    if _listeners:
+        for key, value in old.items():
+            if key not in _default_config:
+                continue
+            # Lazy stores only reload keys that were loaded before.
+            new = _lookup(_config, key) if _store.lazy else _config.get(key)
+            if new != value:
+                _changes.append((key, _copy_value(new)))
+    return True
+
+
+def refresh_config() -> None:
+    """
+    Reload the config if another process changed it and notify the config
+    listeners about all changed values.
+    """
+    with _lock:
+        _refresh(force=True)
+    _notify()
+
+
+def add_config_listener(listener: Callable[[str, Any], None]) -> None:
+    """
+    Call `listener` with the key and new value whenever a config value
+    changes, either in this process or in another one. Changes made by other
+    processes are only noticed when the config is accessed, or right away
+    if the config file is watched (see `watch_config_file`).
+
+    Listeners may be called from a background thread.
+
+    :param listener: The callable to register.
+    :type listener: Callable[[str, Any], None]
+    """
+    _listeners.append(listener)
+
+
+def remove_config_listener(listener: Callable[[str, Any], None]) -> None:
     try:
-        text = json.dumps(config)
-    except Exception as e:
-        log(f"Failed to dump configuration: {e}", "ERROR")
+        _listeners.remove(listener)
+    except ValueError:
+        pass
+
+
+def _notify() -> None:
+    global _changes
+    if not _changes:
         return
-    with open(CONFIG_PATH, "w", encoding="utf-8") as fp:
-        fp.write(text)
+    with _lock:
+        changes, _changes = _changes, []
+    for key, value in changes:
+        for listener in list(_listeners):
+            try:
+                listener(key, value)
+            except Exception as e:
+                log(f"Config listener {listener} failed: {e}", "ERROR")
+
+
+@contextmanager
+def _file_lock() -> Iterator[None]:
+    """Hold an advisory lock on the config file across processes."""
+    paths.CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+    lock_path = paths.CONFIG_PATH.with_name(paths.CONFIG_PATH.name + ".lock")
+    with open(lock_path, "a+b") as fp:
+        if sys.platform == "win32":
+            import msvcrt
+
+            fp.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fp.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                fp.seek(0)
+                msvcrt.locking(fp.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+def watch_config_file() -> None:
+    """
+    Watch the config file using a QFileSystemWatcher instead of checking its
+    modification time on every access. Changes made by other processes are
+    passed to the config listeners as soon as they are noticed. Requires a
+    QCoreApplication instance.
+    """
+    global _watcher
+    if _watcher is not None:
+        return
+    from PyQt6.QtCore import QCoreApplication, QFileSystemWatcher
+
+    if QCoreApplication.instance() is None:
+        log(
+            "Can't watch the config file without a QCoreApplication, "
+            "checking its modification time instead",
+            "WARNING",
+        )
+        return
+    _watcher = QFileSystemWatcher([str(paths.CONFIG_DIR)])
+    _watcher.fileChanged.connect(_on_config_file_changed)
+    _watcher.directoryChanged.connect(_on_config_file_changed)
+    _on_config_file_changed(str(paths.CONFIG_DIR))
+
+
+def _on_config_file_changed(path: str) -> None:
+    global _stale
+    _stale = True
+    # Replacing a file removes it from the watcher.
+    watched = _watcher.files()
+    for store_path in _store.paths():
+        if str(store_path) not in watched and store_path.exists():
+            _watcher.addPath(str(store_path))
+    if _listeners:
+        refresh_config()
+
+
+def _copy_value(value: Any) -> Any:
+    # Mutable values are copied so callers can't change the cache behind
+    # its back, which would keep those changes from being written.
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+def _write_atomic(
+    path: Path,
+    data: str | bytes,
+    mode: int | None = None,
+    best_effort: bool = False,
+) -> bool:
+    """
+    Atomically replace a file, so readers never see a partial file.
+
+    :param path: The file.
+    :type path: Path
+    :param data: The content, text is encoded as UTF-8.
+    :type data: str | bytes
+    :param mode: Permissions of the file, which is otherwise only readable
+    by the owner, defaults to None
+    :type mode: int | None, optional
+    :param best_effort: For caches: return False instead of raising an
+    OSError, and don't wait for the data to reach the disk, defaults to
+    False
+    :type best_effort: bool, optional
+    :return: Whether the file was written.
+    :rtype: bool
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+        )
+    except OSError:
+        if best_effort:
+            return False
+        raise
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+            if not best_effort:
+                fp.flush()
+                os.fsync(fp.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException as e:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        if best_effort and isinstance(e, OSError):
+            return False
+        raise
+    return True
+
+
+class _JsonStore:
+    """Stores the whole config in the config file."""
+
+    # Whether `encode` serializes the whole config or just the given keys.
+    encodes_all_keys = True
+    # Whether keys are read one at a time using `load_key` instead of
+    # loading the whole config using `load`.
+    lazy = False
+
+    def __init__(self, path: Path | None = None) -> None:
+        # Resolved on first use, creating a store doesn't touch the paths.
+        self._path = path
+
+    @property
+    def path(self) -> Path:
+        if self._path is None:
+            self._path = paths.CONFIG_PATH
+        return self._path
+
+    def paths(self) -> list[Path]:
+        return [self.path]
+
+    def create(self, default_config: dict[str, Any]) -> None:
+        """Create the storage if it doesn't exist. Hold `_file_lock`."""
+        if not self.path.exists():
+            _write_atomic(self.path, json.dumps(default_config))
+
+    def signature(self) -> Any:
+        return _file_signature(self.path)
+
+    def load(self) -> dict[str, Any]:
+        with open(self.path, "r", encoding="utf-8") as fp:
+            config: dict[str, Any] = json.load(fp)
+        return config
+
+    def load_key(self, key: str) -> Any:
+        raise KeyError(key)
+
+    def encode(self, config: dict[str, Any], keys: Iterable[str]) -> Any:
+        return json.dumps(config)
+
+    def needs_compaction(self) -> bool:
+        return False
+
+    def write(self, text: Any, compact: bool) -> None:
+        _write_atomic(self.path, text)
+
+
+class _JournalStore(_JsonStore):
+    """
+    Stores the config as a snapshot in the config file and a journal of
+    changes since that snapshot. Every line of the journal is a JSON object
+    with changed keys and their new values.
+
+    Journal records and the snapshot hold an increasing sequence number
+    under `SEQUENCE_KEY`. The snapshot's number is that of the last record
+    merged into it, so records left over from an interrupted compaction are
+    skipped instead of replaying older values over the snapshot.
+    """
+
+    SEQUENCE_KEY = "__journal_sequence__"
+    encodes_all_keys = False
+
+    def __init__(self, path: Path, journal_path: Path, limit: int) -> None:
+        super().__init__(path)
+        self.journal_path = journal_path
+        self.limit = limit
+        self._journal_size = 0
+        # The highest sequence number in the snapshot or the journal.
+        self._sequence = 0
+
+    def paths(self) -> list[Path]:
+        return [self.path, self.journal_path]
+
+    def signature(self) -> Any:
+        return (
+            _file_signature(self.path),
+            _file_signature(self.journal_path),
+        )
+
+    def load(self) -> dict[str, Any]:
+        config = super().load()
+        snapshot_sequence = config.pop(self.SEQUENCE_KEY, None)
+        sequence = snapshot_sequence or 0
+        try:
+            with open(self.journal_path, "rb") as fp:
+                data = fp.read()
+        except FileNotFoundError:
+            data = b""
+        self._journal_size = len(data)
+        for line in data.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Most likely an append that was interrupted by a crash.
+                log("Skipping damaged config journal record", "WARNING")
+                continue
+            record_sequence = record.pop(self.SEQUENCE_KEY, None)
+            if snapshot_sequence is not None and (
+                # Records without a number predate the numbered snapshot.
+                record_sequence is None
+                or record_sequence <= snapshot_sequence
+            ):
+                continue
+            config.update(record)
+            sequence = max(sequence, record_sequence or 0)
+        self._sequence = sequence
+        return config
+
+    def encode(self, config: dict[str, Any], keys: Iterable[str]) -> Any:
+        return json.dumps({key: config[key] for key in keys if key in config})
+
+    def needs_compaction(self) -> bool:
+        return self._journal_size >= self.limit
+
+    def _numbered(self, text: str) -> str:
+        """Add the next sequence number to an encoded JSON object."""
+        self._sequence += 1
+        body = text[1:].lstrip()
+        separator = "" if body.startswith("}") else ", "
+        return (
+            f'{{"{self.SEQUENCE_KEY}": {self._sequence}{separator}{body}'
+        )
+
+    def write(self, text: Any, compact: bool) -> None:
+        if compact:
+            # The snapshot holds a higher sequence number than any record in
+            # the journal, so if this is interrupted between both writes, the
+            # old records are skipped when loading.
+            _write_atomic(self.path, self._numbered(text))
+            _write_atomic(self.journal_path, "")
+            self._journal_size = 0
+            return
+        record = self._numbered(text).encode("utf-8") + b"\n"
+        with open(self.journal_path, "a+b") as fp:
+            # After an append interrupted by a crash, the journal ends
+            # within a damaged record. It must stay on its own line, so
+            # loading only skips it and not also the next record.
+            end = fp.seek(0, os.SEEK_END)
+            if end:
+                fp.seek(end - 1)
+                if fp.read(1) != b"\n":
+                    record = b"\n" + record
+            fp.write(record)
+            fp.flush()
+            os.fsync(fp.fileno())
+            self._journal_size = fp.tell()
+
+
+class _SqliteStore(_JsonStore):
+    """
+    Stores every config key in its own row of an SQLite database, holding
+    its value as JSON.
+    """
+
+    encodes_all_keys = False
+    lazy = True
+
+    def __init__(self, path: Path) -> None:
+        super().__init__(path)
+        self._connection: Any = None
+        self._db_lock = threading.Lock()
+
+    def _connect(self) -> Any:
+        if self._connection is None:
+            import sqlite3
+
+            # Calls are serialized by `_db_lock`.
+            self._connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS config "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID"
+            )
+        return self._connection
+
+    def paths(self) -> list[Path]:
+        return [self.path, self.path.with_name(self.path.name + "-wal")]
+
+    def create(self, default_config: dict[str, Any]) -> None:
+        migrate = not self.path.exists() and paths.CONFIG_PATH.exists()
+        with self._db_lock:
+            connection = self._connect()
+        if not migrate:
+            return
+        journal = _JournalStore(
+            paths.CONFIG_PATH, paths.CONFIG_JOURNAL_PATH, 0
+        )
+        try:
+            config = journal.load()
+        except ValueError as e:
+            log(f"Failed to decode configuration file: {e}", "ERROR")
+            return
+        rows = [
+            (key, json.dumps(value))
+            for key, value in config.items()
+            if key in default_config
+        ]
+        with self._db_lock:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT OR REPLACE INTO config VALUES (?, ?)", rows
+            )
+            connection.execute("COMMIT")
+        config_path = paths.CONFIG_PATH
+        config_path.replace(config_path.with_name(config_path.name + ".bak"))
+        paths.CONFIG_JOURNAL_PATH.unlink(missing_ok=True)
+        log(f"Migrated configuration to {self.path}")
+
+    def signature(self) -> Any:
+        # Changes whenever another connection commits to the database.
+        with self._db_lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()
+
+    def load(self) -> dict[str, Any]:
+        with self._db_lock:
+            rows = self._connect().execute("SELECT key, value FROM config")
+            return {key: json.loads(value) for key, value in rows}
+
+    def load_key(self, key: str) -> Any:
+        with self._db_lock:
+            row = (
+                self._connect()
+                .execute("SELECT value FROM config WHERE key = ?", (key,))
+                .fetchone()
+            )
+        if row is None:
+            raise KeyError(key)
+        try:
+            return json.loads(row[0])
+        except ValueError as e:
+            log(f"Failed to decode configuration value {key!r}: {e}", "ERROR")
+            raise KeyError(key) from e
+
+    def encode(self, config: dict[str, Any], keys: Iterable[str]) -> Any:
+        return [
+            (key, json.dumps(config[key])) for key in keys if key in config
+        ]
+
+    def write(self, rows: Any, compact: bool) -> None:
+        with self._db_lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO config VALUES (?, ?)", rows
+                )
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+
+_store: _JsonStore = _JsonStore()
+
+
+def _is_dirty() -> bool:
+    return _config is not None and _generation != _written_generation
+
+
+def flush_config() -> None:
+    """
+    Write pending config changes to disk immediately.
+
+    If another process changed the config file in the meantime, its changes
+    are merged with the pending ones. Writes are guarded by an advisory
+    lock, so concurrent writers can't lose each other's changes.
+    """
+    global _serialized, _written_generation, _dirty_keys, _signature
+    with _write_lock:
+        with _lock:
+            if not _is_dirty():
+                return
+        with _file_lock():
+            with _lock:
+                if _config is None or not _is_dirty():
+                    return
+                merged = _refresh(force=True)
+                generation = _generation
+                keys = _dirty_keys
+                _dirty_keys = set()
+                compact = _store.needs_compaction()
+                if (
+                    not merged
+                    and not compact
+                    and _serialized is not None
+                    and _serialized[0] == generation
+                    and (_store.encodes_all_keys or keys <= _serialized[1])
+                ):
+                    text = _serialized[2]
+                else:
+                    try:
+                        if compact:
+                            text = json.dumps(_config)
+                        else:
+                            text = _store.encode(_config, keys)
+                    except Exception as e:
+                        _dirty_keys |= keys
+                        log(f"Failed to dump configuration: {e}", "ERROR")
+                        return
+                _serialized = None
+            try:
+                with perf.span("config.write"):
+                    _store.write(text, compact)
+                signature = _store.signature()
+            except Exception as e:
+                with _lock:
+                    _dirty_keys |= keys
+                log(f"Failed to write configuration: {e}", "ERROR")
+                return
+            with _lock:
+                _written_generation = generation
+                _signature = signature
+    _notify()
+
+
+def _schedule_write() -> None:
+    """Schedule writing pending changes. Must not be called with `_lock`."""
+    if _writer is not None:
+        _writer.schedule()
+    else:
+        flush_config()
+
+
+def _shutdown_writer() -> None:
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+    flush_config()
+
+
+class _ConfigWriter(threading.Thread):
+    """Debounces config changes and writes them in the background."""
+
+    def __init__(self, delay: float) -> None:
+        super().__init__(name="ConfigWriter", daemon=True)
+        self.delay = delay
+        self._cond = threading.Condition()
+        self._first_change: float | None = None
+        self._deadline = 0.0
+        self._stopped = False
+
+    def schedule(self) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if self._first_change is None:
+                self._first_change = now
+            self._deadline = min(
+                now + self.delay,
+                self._first_change + self.delay * MAX_WRITE_DELAY_FACTOR,
+            )
+            self._cond.notify()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self.join()
+
+    def run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._first_change is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopped:
+                    return
+                self._first_change = None
+            flush_config()
+
+
+def _transaction() -> dict[str, Any] | None:
+    tx: dict[str, Any] | None = getattr(_local, "transaction", None)
+    return tx
 
 
 def get_config_value(key: str) -> Any:
+    tx = _transaction()
+    if tx is not None and key in tx:
+        return _copy_value(tx[key])
+    with _lock:
+        val = _copy_value(_lookup(_get_config(), key))
+    if _changes:
+        _notify()
+    return val
+
+
+def _lookup(config: dict[str, Any], key: str) -> Any:
+    """Return a value from the cached config, loading it if needed."""
     try:
-        val = _get_config()[key]
+        return config[key]
     except KeyError:
         val = _default_config[key]
+    if _store.lazy:
+        try:
+            val = _store.load_key(key)
+        except KeyError:
+            val = copy.deepcopy(val)
+        config[key] = val
     return val
 
 
+def _changed_value(config: dict[str, Any], key: str, value: Any) -> None:
+    """Queue a notification if `value` differs from the current value."""
+    if not _listeners:
+        return
+    try:
+        old = _lookup(config, key)
+    except KeyError:
+        old = None
+    if old != value:
+        _changes.append((key, _copy_value(value)))
+
+
 def set_config_value(key: str, value: Any) -> None:
-    config = _get_config()
-    config[key] = value
-    _overwrite_config(config)
+    global _generation
+    tx = _transaction()
+    if tx is not None:
+        tx[key] = _copy_value(value)
+        return
+    try:
+        json.dumps(value)
+    except Exception as e:
+        log(f"Failed to dump configuration value {key!r}: {e}", "ERROR")
+        return
+    with _lock:
+        config = _get_config()
+        _changed_value(config, key, value)
+        config[key] = _copy_value(value)
+        _dirty_keys.add(key)
+        _generation += 1
+    _notify()
+    _schedule_write()
+
+
+def set_config_values(values: Mapping[str, Any]) -> None:
+    """
+    Set multiple config values at once.
+
+    All values are applied in one pass and the config is serialized once,
+    resulting in a single write of the config file. If the config can't be
+    serialized, all changes are rolled back and the error is raised.
+
+    :param values: A mapping of config keys to their new values.
+    :type values: Mapping[str, Any]
+    """
+    global _generation, _serialized
+    if not values:
+        return
+    tx = _transaction()
+    if tx is not None:
+        tx.update((key, _copy_value(value)) for key, value in values.items())
+        return
+    with _lock:
+        config = _get_config()
+        previous = {key: config[key] for key in values if key in config}
+        changes = len(_changes)
+        for key, value in values.items():
+            _changed_value(config, key, value)
+            config[key] = _copy_value(value)
+        try:
+            text = _store.encode(config, values)
+        except Exception as e:
+            for key in values:
+                if key in previous:
+                    config[key] = previous[key]
+                else:
+                    del config[key]
+            del _changes[changes:]
+            log(f"Failed to dump configuration: {e}", "ERROR")
+            raise
+        _dirty_keys.update(values)
+        _generation += 1
+        _serialized = (_generation, frozenset(values), text)
+    _notify()
+    _schedule_write()
+
+
+@contextmanager
+def transaction() -> Iterator[None]:
+    """
+    Group config changes made by the current thread.
+
+    Within the block, `set_config_value` and `set_config_values` only
+    record their changes and `get_config_value` already returns them. When
+    the block exits normally, all changes are applied at once using
+    `set_config_values`. When it raises, the changes are discarded. Nested
+    transactions are merged into the outermost one.
+    """
+    if _transaction() is not None:
+        yield
+        return
+    tx: dict[str, Any] = {}
+    _local.transaction = tx
+    try:
+        yield
+    finally:
+        _local.transaction = None
+    set_config_values(tx)
+
 
+LogOverflow = Literal["block", "drop_new", "drop_old"]
 
-def log(msg: str, level: str = "INFO") -> None:
+LOG_LEVELS = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+}
+# Records of these levels are written to disk before `log` returns.
+FLUSH_LOG_LEVELS = {"ERROR", "CRITICAL"}
+
+_log_queue_size = 10_000
+_log_overflow: LogOverflow = "block"
+_log_min_level = LOG_LEVELS["DEBUG"]
+_log_max_bytes: int | None = 10 * 1024 * 1024
+_log_backup_count = 3
+_log_writer: "_LogWriter | None" = None
+_log_writer_lock = threading.Lock()
+_log_closed = False
+
+
+def configure_log(
+    queue_size: int = 10_000,
+    overflow: LogOverflow = "block",
+    min_level: str = "DEBUG",
+    max_bytes: int | None = 10 * 1024 * 1024,
+    backup_count: int = 3,
+) -> None:
+    """
+    Configure which records are logged, how they are queued for the
+    background log writer and when the log file is rotated.
+
+    :param queue_size: Maximum number of records waiting to be written,
+    defaults to 10000
+    :type queue_size: int, optional
+    :param overflow: What to do with a new record while the queue is full.
+    "block" waits for the writer to catch up, "drop_new" discards the new
+    record and "drop_old" discards the oldest queued record. The number of
+    dropped records is logged, defaults to "block"
+    :type overflow: str, optional
+    :param min_level: Records with a lower level are discarded before their
+    message is formatted, defaults to "DEBUG"
+    :type min_level: str, optional
+    :param max_bytes: The log file is rotated once it grows beyond this
+    size. None disables rotation while running, defaults to 10 MiB
+    :type max_bytes: int | None, optional
+    :param backup_count: Number of gzip compressed previous log files to
+    keep, defaults to 3
+    :type backup_count: int, optional
+    """
+    global _log_queue_size, _log_overflow, _log_min_level, _log_max_bytes
+    global _log_backup_count
+    if overflow not in ("block", "drop_new", "drop_old"):
+        raise ValueError(f"Unknown log overflow policy {overflow!r}")
+    if min_level not in LOG_LEVELS:
+        raise ValueError(f"Unknown log level {min_level!r}")
+    _log_queue_size = queue_size
+    _log_overflow = overflow
+    _log_min_level = LOG_LEVELS[min_level]
+    _log_max_bytes = max_bytes
+    _log_backup_count = backup_count
+    if _log_writer is not None:
+        _log_writer.configure(queue_size, overflow)
+
+
+def _get_log_writer() -> "_LogWriter | None":
+    """Return the log writer, starting it on first use. None after exit."""
+    global _log_writer
+    if _log_writer is None and not _log_closed:
+        with _log_writer_lock:
+            if _log_writer is None and not _log_closed:
+                writer = _LogWriter(_log_queue_size, _log_overflow)
+                writer.start()
+                atexit.register(_shutdown_log_writer)
+                _log_writer = writer
+    return _log_writer
+
+
+def _shutdown_log_writer() -> None:
+    global _log_writer, _log_closed
+    with _log_writer_lock:
+        _log_closed = True
+        writer, _log_writer = _log_writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def flush_log() -> None:
+    """Wait until all queued log records are written to the log file."""
+    writer = _get_log_writer()
+    if writer is not None and threading.current_thread() is not writer:
+        writer.call(writer.flush)
+
+
+class _LogWriter(threading.Thread):
+    """
+    Writes queued log records to the log file in batches, keeping the file
+    open in between.
+    """
+
+    def __init__(self, queue_size: int, overflow: LogOverflow) -> None:
+        super().__init__(name="LogWriter", daemon=True)
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self._cond = threading.Condition()
+        self._records: deque[str] = deque()
+        # Callables run by the writer thread after writing the queued
+        # records, each with an event set once it ran.
+        self._commands: list[tuple[Callable[[], None], threading.Event]] = []
+        self._dropped = 0
+        self._stopped = False
+        self._fp: TextIO | None = None
+        self._size = 0
+
+    def configure(self, queue_size: int, overflow: LogOverflow) -> None:
+        with self._cond:
+            self.queue_size = queue_size
+            self.overflow = overflow
+            self._cond.notify_all()
+
+    def put(self, records: list[str]) -> None:
+        with self._cond:
+            for record in records:
+                if len(self._records) >= self.queue_size:
+                    if self.overflow == "drop_new":
+                        self._dropped += 1
+                        continue
+                    elif self.overflow == "drop_old":
+                        self._records.popleft()
+                        self._dropped += 1
+                    else:
+                        self._cond.notify_all()
+                        while (
+                            len(self._records) >= self.queue_size
+                            and not self._stopped
+                        ):
+                            self._cond.wait()
+                self._records.append(record)
+            self._cond.notify_all()
+
+    def call(self, command: Callable[[], None]) -> None:
+        """Run `command` in the writer thread and wait for it to finish."""
+        event = threading.Event()
+        with self._cond:
+            if self._stopped:
+                return
+            self._commands.append((command, event))
+            self._cond.notify_all()
+        event.wait()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.join()
+
+    def flush(self) -> None:
+        if self._fp is not None:
+            self._fp.flush()
+
+    def truncate(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+        # Opened for appending like in `_write`, so records always go to
+        # the end, even after another process truncated the file.
+        self._fp = open(paths.LOGGER_PATH, "a", encoding="utf-8")
+        self._fp.truncate(0)
+        self._size = 0
+
+    def rotate(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+        log_path = paths.LOGGER_PATH
+        if log_path.exists() and log_path.stat().st_size:
+            backups = [
+                log_path.with_name(f"{log_path.name}.{i}.gz")
+                for i in range(1, _log_backup_count + 1)
+            ]
+            for i in range(len(backups) - 1, 0, -1):
+                if backups[i - 1].exists():
+                    backups[i - 1].replace(backups[i])
+            if backups:
+                with (
+                    open(log_path, "rb") as src,
+                    gzip.open(backups[0], "wb") as dst,
+                ):
+                    shutil.copyfileobj(src, dst)
+        self.truncate()
+
+    def run(self) -> None:
+        while True:
+            with self._cond:
+                while (
+                    not self._records
+                    and not self._commands
+                    and not self._stopped
+                ):
+                    self._cond.wait()
+                records = list(self._records)
+                self._records.clear()
+                commands, self._commands = self._commands, []
+                dropped, self._dropped = self._dropped, 0
+                stopped = self._stopped
+                # Wake up callers waiting for space in the queue.
+                self._cond.notify_all()
+            if dropped:
+                time = datetime.now().isoformat()
+                records.append(
+                    f"[{time}] [WARNING] Dropped {dropped} log records\n"
+                )
+            self._write(records)
+            for command, event in commands:
+                try:
+                    command()
+                except Exception as e:
+                    print(f"Log writer failed: {e}", file=sys.__stderr__)
+                event.set()
+            if stopped:
+                if self._fp is not None:
+                    self._fp.close()
+                return
+
+    def _write(self, records: list[str]) -> None:
+        if not records:
+            return
+        try:
+            if self._fp is None:
+                self._fp = open(paths.LOGGER_PATH, "a", encoding="utf-8")
+            self._fp.write("".join(records))
+            self._fp.flush()
+            self._size = self._fp.tell()
+            if _log_max_bytes is not None and self._size >= _log_max_bytes:
+                self.rotate()
+        except OSError as e:
+            print(f"Failed to write log: {e}", file=sys.__stderr__)
+            self._fp = None
+
+
+def log(
+    msg: str | Callable[[], str],
+    level: str = "INFO",
+    *args: Any,
+) -> None:
+    """
+    Write a record to the log file.
+
+    The level is checked before the message is formatted, so records below
+    the minimum level (see `configure_log`) cost almost nothing. To benefit
+    from this, pass a callable returning the message or %-style arguments:
+
+    `log("Loaded %d styles from %s", "DEBUG", count, path)`
+
+    :param msg: The message, a %-style format string if `args` are given or
+    a callable returning the message.
+    :type msg: str | Callable[[], str]
+    :param level: The level of the record, defaults to "INFO"
+    :type level: str, optional
+    """
+    if LOG_LEVELS.get(level, 20) < _log_min_level:
+        return
+    if callable(msg):
+        msg = msg()
+    if args:
+        msg = msg % args
+    _emit([msg], level)
+
+
+def _emit(messages: list[str], level: str) -> None:
+    """Write one record per message, sharing the same timestamp."""
     time = datetime.now().isoformat()
-    with open(LOGGER_PATH, "a", encoding="utf-8") as fp:
-        fp.write(f"[{time}] [{level}] {msg}\n")
+    records = [f"[{time}] [{level}] {msg}\n" for msg in messages]
+    writer = _get_log_writer()
+    if writer is None:
+        # The writer already shut down while exiting.
+        with open(paths.LOGGER_PATH, "a", encoding="utf-8") as fp:
+            fp.writelines(records)
+        return
+    writer.put(records)
+    if level in FLUSH_LOG_LEVELS:
+        flush_log()
+
 
+class LogStream(io.TextIOBase):
+    """
+    A writable text stream logging every line written to it, e.g. to
+    redirect `sys.stdout` and `sys.stderr`. Incomplete lines are buffered
+    until they are completed, the stream is flushed or closed. Multiple
+    threads may write to the same stream.
+    """
 
-class LogStream:
     def __init__(self, level: str = "INFO") -> None:
+        super().__init__()
         self.level = level
+        self._parts: list[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self) -> str:  # type: ignore[override]
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def isatty(self) -> bool:
+        return False
+
+    def fileno(self) -> int:
+        raise io.UnsupportedOperation("LogStream has no file descriptor")
+
+    def write(self, text: str) -> int:
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        if LOG_LEVELS.get(self.level, 20) < _log_min_level:
+            return len(text)
+        with self._lock:
+            self._parts.append(text)
+            if "\n" in text:
+                *lines, rest = "".join(self._parts).split("\n")
+                self._parts = [rest] if rest else []
+                # Emitted while holding the lock to keep lines in order.
+                _emit(lines, self.level)
+        return len(text)
+
+    def writelines(  # type: ignore[override]
+        self, lines: Iterable[str], /
+    ) -> None:
+        self.write("".join(lines))
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._parts:
+                _emit(["".join(self._parts)], self.level)
+                self._parts = []
 
-    def write(self, text: str) -> None:
-        log(text, self.level)
+    def close(self) -> None:
+        if not self.closed:
+            self.flush()
+        super().close()
@@ -0,0 +1,102 @@
+import weakref
+from collections.abc import Callable
+from typing import Any
+
+from PyQt6 import sip
+from PyQt6.QtCore import QObject, pyqtSignal
+
+try:
+    from . import config
+except ImportError:
+    import config  # type: ignore[no-redef]
+
+
+class ConfigNotifier(QObject):
+    """
+    Emits `changed` with the key and new value whenever a config value
+    changes, either through `set_config_value`/`set_config_values` or because
+    another process changed the config file. Values that are set to what
+    they already were don't emit anything.
+
+    Use `subscribe` to only get notified about specific keys.
+    """
+
+    changed = pyqtSignal(str, object)
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        # Bound methods are referenced weakly, so subscribing doesn't keep
+        # their object alive.
+        self._subscribers: dict[
+            str, list[Callable[[Any], None] | weakref.WeakMethod[Any]]
+        ] = {}
+        self.changed.connect(self._dispatch)
+        # Listeners may be called from the config writer thread, the signal
+        # takes care of delivering the change to the thread of this object.
+        listener = self.changed.emit
+        config.add_config_listener(listener)
+        self.destroyed.connect(
+            lambda: config.remove_config_listener(listener)
+        )
+        config.watch_config_file()
+
+    def subscribe(self, key: str, slot: Callable[[Any], None]) -> None:
+        """
+        Call `slot` with the new value whenever the value of `key` changes.
+        If `slot` is a bound method, it is unsubscribed automatically when
+        its object is garbage collected or, for a QObject, destroyed.
+
+        :param key: The config key.
+        :type key: str
+        :param slot: The callable to call with the new value.
+        :type slot: Callable[[Any], None]
+        """
+        entry: Callable[[Any], None] | weakref.WeakMethod[Any] = slot
+        if hasattr(slot, "__self__") and hasattr(slot, "__func__"):
+            entry = weakref.WeakMethod(slot)
+        self._subscribers.setdefault(key, []).append(entry)
+
+    def unsubscribe(self, key: str, slot: Callable[[Any], None]) -> None:
+        entries = self._subscribers.get(key, [])
+        for entry in entries:
+            if entry == slot or _resolve(entry) == slot:
+                entries.remove(entry)
+                return
+
+    def _dispatch(self, key: str, value: Any) -> None:
+        entries = self._subscribers.get(key)
+        if not entries:
+            return
+        for entry in list(entries):
+            slot = _resolve(entry)
+            if slot is None:
+                entries.remove(entry)
+            else:
+                slot(value)
+
+
+def _resolve(
+    entry: Callable[[Any], None] | weakref.WeakMethod[Any],
+) -> Callable[[Any], None] | None:
+    """Return the slot of a subscription, None if its object is gone."""
+    if not isinstance(entry, weakref.WeakMethod):
+        return entry
+    slot: Callable[[Any], None] | None = entry()
+    owner = getattr(slot, "__self__", None)
+    if isinstance(owner, QObject) and sip.isdeleted(owner):
+        return None
+    return slot
+
+
+_notifier: ConfigNotifier | None = None
+
+
+def config_notifier() -> ConfigNotifier:
+    """
+    Return the application wide ConfigNotifier, creating it on first use.
+    A QApplication must exist already.
+    """
+    global _notifier
+    if _notifier is None:
+        _notifier = ConfigNotifier()
+    return _notifier
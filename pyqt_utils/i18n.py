@@ -0,0 +1,203 @@
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+from PyQt6.QtCore import (
+    QCoreApplication,
+    QLocale,
+    QObject,
+    QTranslator,
+    pyqtSignal,
+)
+
+try:
+    from . import config, paths
+except ImportError:
+    import config  # type: ignore[no-redef]
+    import paths  # type: ignore[no-redef]
+
+# Number of translators kept loaded, including the installed one.
+TRANSLATOR_CACHE_SIZE = 4
+
+
+class TranslationManager(QObject):
+    """
+    Installs the translations compiled by `pyqt-utils --compile-langs`,
+    the .qm files in the LANGS_PATH. A language is the name of its .qm file
+    without the suffix, e.g. "de" for langs/de.qm.
+
+    The available languages are found by listing the directory, files are
+    only loaded when a language is used. Qt maps them into memory instead
+    of reading them where the platform supports it. The last few used
+    translators stay loaded, so switching back and forth doesn't load them
+    again.
+
+    Switching the language replaces the installed translator in one step,
+    so Qt sends only one round of `QEvent.Type.LanguageChange`. Widgets
+    should retranslate their texts in `changeEvent`, like the
+    `LicenseViewer`. `language_changed` is emitted with the new language,
+    or an empty string, afterwards.
+    """
+
+    language_changed = pyqtSignal(str)
+
+    def __init__(
+        self,
+        langs_path: Path | None = None,
+        cache_size: int = TRANSLATOR_CACHE_SIZE,
+        parent: QObject | None = None,
+    ) -> None:
+        """
+        :param langs_path: The directory containing the .qm files, defaults
+        to LANGS_PATH.
+        :type langs_path: Path | None, optional
+        :param cache_size: The number of translators kept loaded, defaults
+        to TRANSLATOR_CACHE_SIZE
+        :type cache_size: int, optional
+        """
+        super().__init__(parent)
+        self._langs_path = langs_path
+        self.cache_size = max(cache_size, 1)
+        self._language: str | None = None
+        self._translators: OrderedDict[str, QTranslator] = OrderedDict()
+        self._files: dict[str, Path] = {}
+        self._files_mtime: int | None = None
+
+    @property
+    def langs_path(self) -> Path:
+        if self._langs_path is None:
+            return paths.LANGS_PATH
+        return self._langs_path
+
+    @property
+    def language(self) -> str | None:
+        """The installed language, None if no translation is installed."""
+        return self._language
+
+    def languages(self) -> list[str]:
+        """Return the available languages, sorted."""
+        return sorted(self._index())
+
+    def best_language(self, locale: QLocale | None = None) -> str | None:
+        """
+        Return the available language matching a locale best, e.g. "de_AT"
+        or "de" for the locale de-AT.
+
+        :param locale: The locale, defaults to the system locale.
+        :type locale: QLocale | None, optional
+        :return: The language, None if no language matches.
+        :rtype: str | None
+        """
+        if locale is None:
+            locale = QLocale.system()
+        files = self._index()
+        exact: list[str] = [locale.name()]
+        fallbacks: list[str] = []
+        for ui_language in locale.uiLanguages():
+            # E.g. "de-Latn-AT", the script is left out in file names.
+            parts = ui_language.split("-")
+            exact += ["_".join(parts), f"{parts[0]}_{parts[-1]}"]
+            fallbacks.append(parts[0])
+        for candidate in dict.fromkeys(exact + fallbacks):
+            if candidate in files:
+                return candidate
+        return None
+
+    def set_language(self, language: str | None) -> bool:
+        """
+        Install the translation of a language, replacing the installed one.
+
+        :param language: The language, None to remove the installed
+        translation.
+        :type language: str | None
+        :return: Whether the language was installed. Fails if there's no
+        valid .qm file for the language.
+        :rtype: bool
+        """
+        if language == self._language:
+            return True
+        translator = None
+        if language is not None:
+            translator = self._translator(language)
+            if translator is None:
+                return False
+        if self._language is not None:
+            QCoreApplication.removeTranslator(
+                self._translators[self._language]
+            )
+        # Qt compresses the LanguageChange events of removing and
+        # installing a translator, widgets are retranslated only once.
+        if translator is not None:
+            QCoreApplication.installTranslator(translator)
+        self._language = language
+        self._evict()
+        self.language_changed.emit(language or "")
+        return True
+
+    def preload(self, language: str) -> bool:
+        """
+        Load the translation of a language without installing it, so
+        switching to it later is instant.
+
+        :return: Whether the translation could be loaded.
+        :rtype: bool
+        """
+        loaded = self._translator(language) is not None
+        self._evict()
+        return loaded
+
+    def _index(self) -> dict[str, Path]:
+        """
+        Return the .qm files by language. The directory is only listed again
+        after it changed.
+        """
+        try:
+            mtime = self.langs_path.stat().st_mtime_ns
+        except OSError:
+            return {}
+        if mtime != self._files_mtime:
+            with os.scandir(self.langs_path) as entries:
+                self._files = {
+                    entry.name[:-len(".qm")]: Path(entry.path)
+                    for entry in entries
+                    if entry.name.endswith(".qm") and entry.is_file()
+                }
+            self._files_mtime = mtime
+        return self._files
+
+    def _translator(self, language: str) -> QTranslator | None:
+        translator = self._translators.get(language)
+        if translator is not None:
+            self._translators.move_to_end(language)
+            return translator
+        path = self._index().get(language)
+        if path is None:
+            config.log(f"No translation for the language {language}", "ERROR")
+            return None
+        translator = QTranslator()
+        if not translator.load(str(path)):
+            config.log(f"Failed to load the translation {path}", "ERROR")
+            return None
+        self._translators[language] = translator
+        return translator
+
+    def _evict(self) -> None:
+        for language in list(self._translators):
+            if len(self._translators) <= self.cache_size:
+                break
+            if language != self._language:
+                del self._translators[language]
+
+
+_manager: TranslationManager | None = None
+
+
+def translation_manager() -> TranslationManager:
+    """
+    Return the application wide TranslationManager, creating it on first
+    use. A QCoreApplication must exist already.
+    """
+    global _manager
+    if _manager is None:
+        _manager = TranslationManager()
+    return _manager
@@ -0,0 +1,398 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+from xml.sax.saxutils import escape, quoteattr
+
+from PyQt6.QtCore import QBuffer, QFile, QIODevice, QResource, Qt
+from PyQt6.QtGui import QGuiApplication, QIcon, QImage, QPainter, QPixmap
+from PyQt6.QtSvg import QSvgRenderer
+
+try:
+    from . import config, paths
+except ImportError:
+    import config  # type: ignore[no-redef]
+    import paths  # type: ignore[no-redef]
+
+# The resource prefix of the icons, e.g. ":/icons/save.svg".
+RESOURCE_PREFIX = "/icons"
+RCC_NAME = "icons.rcc"
+# Sizes an icon is rasterized at by default, in device independent pixels.
+DEFAULT_SIZES = (16, 24, 32, 48)
+# Approximate memory used by cached icons and pixmaps before the least
+# recently used ones are dropped.
+CACHE_BYTES = 32 * 1024 * 1024
+# Tried in this order if an icon name has no suffix.
+ICON_SUFFIXES = (".svg", ".png")
+# Files in the icons directory that aren't icons.
+_EXCLUDED_SUFFIXES = {".qrc", ".rcc", ".py", ".pyc"}
+
+_registered: set[Path] = set()
+# Icons and pixmaps with their size in bytes, least recently used first.
+_cache: OrderedDict[tuple[Any, ...], tuple[QIcon | QPixmap, int]] = (
+    OrderedDict()
+)
+_cache_bytes = 0
+_sources: dict[str, str] = {}
+# Digest of every source with the signature of the file it was computed for.
+_digests: dict[str, tuple[Any, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def icon_files(icons_path: Path) -> list[Path]:
+    """
+    Return all files in the icons directory that are put into the icon
+    resources, sorted.
+
+    :param icons_path: The icons directory.
+    :type icons_path: Path
+    :rtype: list[Path]
+    """
+    return sorted(
+        path
+        for path in icons_path.rglob("*")
+        if path.is_file()
+        and path.suffix not in _EXCLUDED_SUFFIXES
+        and not any(
+            part.startswith(".") or part == "__pycache__"
+            for part in path.relative_to(icons_path).parts
+        )
+    )
+
+
+def generate_qrc(icons_path: Path) -> str:
+    """
+    Generate a .qrc file containing all icons below `icons_path`, aliased to
+    their path relative to it, with the RESOURCE_PREFIX.
+
+    :param icons_path: The icons directory.
+    :type icons_path: Path
+    :return: The contents of the .qrc file.
+    :rtype: str
+    """
+    icons_path = icons_path.resolve()
+    lines = [
+        "<!DOCTYPE RCC>",
+        '<RCC version="1.0">',
+        f"<qresource prefix={quoteattr(RESOURCE_PREFIX)}>",
+    ]
+    for path in icon_files(icons_path):
+        alias = path.relative_to(icons_path).as_posix()
+        lines.append(
+            f"    <file alias={quoteattr(alias)}>{escape(str(path))}</file>"
+        )
+    lines += ["</qresource>", "</RCC>", ""]
+    return "\n".join(lines)
+
+
+def register_icon_resources(path: Path | None = None) -> bool:
+    """
+    Register the binary icon resources compiled by
+    `pyqt-utils --compile-icons-rcc`. Qt maps the file into memory instead
+    of loading it. Afterwards the icons are available below
+    ":/icons/", e.g. `QIcon(":/icons/save.svg")`.
+
+    :param path: The .rcc file, defaults to icons.rcc in the ICONS_PATH.
+    :type path: Path | None, optional
+    :return: Whether the resources are registered.
+    :rtype: bool
+    """
+    if path is None:
+        path = paths.ICONS_PATH / RCC_NAME
+    if path in _registered:
+        return True
+    if not QResource.registerResource(str(path)):
+        config.log(f"Failed to register the icon resources {path}", "ERROR")
+        return False
+    _registered.add(path)
+    return True
+
+
+def icon_source(name: str) -> str:
+    """
+    Resolve an icon name, e.g. "save" or "actions/save.svg", to the icon in
+    the registered icon resources or the ICONS_PATH. Names without a suffix
+    are tried with the ICON_SUFFIXES.
+
+    :param name: The name of the icon, relative to the icons directory.
+    :type name: str
+    :raises FileNotFoundError: If there's no such icon.
+    :return: The resource path or file path of the icon.
+    :rtype: str
+    """
+    source = _sources.get(name)
+    if source is not None:
+        return source
+    names = [name] if Path(name).suffix else [
+        name + suffix for suffix in ICON_SUFFIXES
+    ]
+    for candidate in names:
+        for source in (
+            f":{RESOURCE_PREFIX}/{candidate}",
+            str(paths.ICONS_PATH / candidate),
+        ):
+            if QFile.exists(source):
+                _sources[name] = source
+                return source
+    raise FileNotFoundError(f"No icon named {name!r}")
+
+
+def device_pixel_ratios() -> list[float]:
+    """Return the device pixel ratios of all screens."""
+    app = QGuiApplication.instance()
+    if not isinstance(app, QGuiApplication):
+        return [1.0]
+    return sorted(
+        {screen.devicePixelRatio() for screen in app.screens()}
+    ) or [1.0]
+
+
+def pixmap(name: str, size: int, dpr: float | None = None) -> QPixmap:
+    """
+    Return an icon rendered at `size` device independent pixels for a
+    device pixel ratio. Requires a QGuiApplication.
+
+    :param name: The name of the icon, see `icon_source`.
+    :type name: str
+    :param size: The width and height.
+    :type size: int
+    :param dpr: The device pixel ratio, defaults to that of the
+    application.
+    :type dpr: float | None, optional
+    :rtype: QPixmap
+    """
+    if dpr is None:
+        app = QGuiApplication.instance()
+        dpr = (
+            app.devicePixelRatio()
+            if isinstance(app, QGuiApplication)
+            else 1.0
+        )
+    source = icon_source(name)
+    key = ("pixmap", source, size, dpr)
+    cached = _cache_get(key)
+    if isinstance(cached, QPixmap):
+        return cached
+    result = QPixmap.fromImage(rasterize(source, size, dpr))
+    _cache_put(key, result, _pixmap_bytes(result))
+    return result
+
+
+def icon(name: str, sizes: Iterable[int] = DEFAULT_SIZES) -> QIcon:
+    """
+    Return an icon containing pixmaps for the given sizes at the device
+    pixel ratios of all screens. Requires a QGuiApplication.
+
+    :param name: The name of the icon, see `icon_source`.
+    :type name: str
+    :param sizes: The sizes to rasterize the icon at, defaults to
+    DEFAULT_SIZES
+    :type sizes: Iterable[int], optional
+    :rtype: QIcon
+    """
+    sizes = tuple(sizes)
+    dprs = tuple(device_pixel_ratios())
+    source = icon_source(name)
+    key = ("icon", source, sizes, dprs)
+    cached = _cache_get(key)
+    if isinstance(cached, QIcon):
+        return cached
+    # Not taken from or put into the pixmap cache, the icon holds its own
+    # pixmaps and their memory is only counted for the icon.
+    result = QIcon()
+    cost = 0
+    for size in sizes:
+        for dpr in dprs:
+            image = QPixmap.fromImage(rasterize(source, size, dpr))
+            result.addPixmap(image)
+            cost += _pixmap_bytes(image)
+    _cache_put(key, result, cost)
+    return result
+
+
+def rasterize(source: str, size: int, dpr: float) -> QImage:
+    """
+    Render an icon, `size` device independent pixels wide and high. SVG
+    renderings are stored in the LIB_DIR, if it exists, and reused as long
+    as the SVG doesn't change. Safe to call from any thread.
+
+    :param source: The path of the icon, see `icon_source`.
+    :type source: str
+    :param size: The width and height.
+    :type size: int
+    :param dpr: The device pixel ratio.
+    :type dpr: float
+    :rtype: QImage
+    """
+    pixels = round(size * dpr)
+    if not source.lower().endswith(".svg"):
+        image = QImage(source)
+        if image.width() != pixels or image.height() != pixels:
+            image = image.scaled(
+                pixels,
+                pixels,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
+            )
+        image.setDevicePixelRatio(dpr)
+        return image
+
+    digest, data = _digest(source)
+    cache_file = _raster_cache_dir() / f"{digest}-{size}@{dpr:g}x.png"
+    image = QImage(str(cache_file))
+    if image.isNull():
+        if data is None:
+            data = _read(source)
+        image = QImage(
+            pixels, pixels, QImage.Format.Format_ARGB32_Premultiplied
+        )
+        image.fill(Qt.GlobalColor.transparent)
+        renderer = QSvgRenderer(data)
+        renderer.setAspectRatioMode(Qt.AspectRatioMode.KeepAspectRatio)
+        painter = QPainter(image)
+        renderer.render(painter)
+        painter.end()
+        _save_image(image, cache_file)
+    image.setDevicePixelRatio(dpr)
+    return image
+
+
+def prerasterize(
+    names: Iterable[str] | None = None,
+    sizes: Iterable[int] = DEFAULT_SIZES,
+    dprs: Iterable[float] | None = None,
+) -> int:
+    """
+    Render SVG icons into the LIB_DIR, so later launches don't have to
+    render them. Safe to call from any thread, e.g. in the background after
+    startup.
+
+    :param names: The icon names, defaults to all SVG icons in the
+    ICONS_PATH.
+    :type names: Iterable[str] | None, optional
+    :param sizes: The sizes, defaults to DEFAULT_SIZES
+    :type sizes: Iterable[int], optional
+    :param dprs: The device pixel ratios, defaults to those of all screens.
+    :type dprs: Iterable[float] | None, optional
+    :return: The number of rasterized icons.
+    :rtype: int
+    """
+    if names is None:
+        names = [
+            path.relative_to(paths.ICONS_PATH).as_posix()
+            for path in icon_files(paths.ICONS_PATH)
+            if path.suffix == ".svg"
+        ]
+    sizes = tuple(sizes)
+    dprs = tuple(dprs) if dprs is not None else tuple(device_pixel_ratios())
+    count = 0
+    for name in names:
+        source = icon_source(name)
+        if not source.lower().endswith(".svg"):
+            continue
+        for size in sizes:
+            for dpr in dprs:
+                rasterize(source, size, dpr)
+                count += 1
+    return count
+
+
+def clear_icon_cache(disk: bool = False) -> None:
+    """
+    Drop all cached icons and pixmaps.
+
+    :param disk: Also delete the renderings stored in the LIB_DIR,
+    defaults to False
+    :type disk: bool, optional
+    """
+    global _cache_bytes
+    _cache.clear()
+    _cache_bytes = 0
+    _sources.clear()
+    if disk:
+        for path in _raster_cache_dir().glob("*.png"):
+            path.unlink(missing_ok=True)
+
+
+def _cache_get(key: tuple[Any, ...]) -> QIcon | QPixmap | None:
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    _cache.move_to_end(key)
+    return entry[0]
+
+
+def _cache_put(
+    key: tuple[Any, ...], value: QIcon | QPixmap, cost: int
+) -> None:
+    global _cache_bytes
+    old = _cache.pop(key, None)
+    if old is not None:
+        _cache_bytes -= old[1]
+    _cache[key] = (value, cost)
+    _cache_bytes += cost
+    while _cache_bytes > CACHE_BYTES and len(_cache) > 1:
+        _, (_, evicted_cost) = _cache.popitem(last=False)
+        _cache_bytes -= evicted_cost
+
+
+def _pixmap_bytes(image: QPixmap) -> int:
+    return image.width() * image.height() * image.depth() // 8
+
+
+def _raster_cache_dir() -> Path:
+    return paths.LIB_DIR / "icon_cache"
+
+
+def _read(source: str) -> bytes:
+    file = QFile(source)
+    if not file.open(QIODevice.OpenModeFlag.ReadOnly):
+        raise FileNotFoundError(f"Can't read {source}: {file.errorString()}")
+    data = bytes(file.readAll().data())
+    file.close()
+    return data
+
+
+def _digest(source: str) -> tuple[str, bytes | None]:
+    """
+    Return the digest of an icon. The file is only read if its size or
+    modification time changed since its digest was computed, the contents
+    are returned too in that case.
+    """
+    if source.startswith(":"):
+        signature: Any = None
+    else:
+        stat = os.stat(source)
+        signature = (stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        cached = _digests.get(source)
+        if cached is not None and cached[0] == signature:
+            return cached[1], None
+    data = _read(source)
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    with _digests_lock:
+        _digests[source] = (signature, digest)
+    return digest, data
+
+
+def _save_image(image: QImage, path: Path) -> None:
+    """
+    Store a rasterized icon, ignoring errors. Nothing is stored without a
+    LIB_DIR.
+    """
+    if not paths.LIB_DIR.is_dir():
+        return
+    buffer = QBuffer()
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    if not image.save(buffer, "PNG"):
+        return
+    try:
+        path.parent.mkdir(exist_ok=True)
+    except OSError:
+        return
+    config._write_atomic(
+        path, bytes(buffer.data().data()), mode=0o644, best_effort=True
+    )
@@ -1,78 +1,488 @@
+import bisect
+import functools
 import json
-from typing import NamedTuple
+import re
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any, NamedTuple
 
-from PyQt6.QtCore import QSize, Qt
-from PyQt6.QtGui import QFont
+from PyQt6.QtCore import (
+    QAbstractListModel,
+    QCoreApplication,
+    QEvent,
+    QModelIndex,
+    QObject,
+    QPersistentModelIndex,
+    QSize,
+    Qt,
+    pyqtSignal,
+)
+from PyQt6.QtGui import QColor, QFont, QTextCharFormat
 from PyQt6.QtWidgets import (
     QAbstractItemView,
     QDialog,
     QFrame,
     QHBoxLayout,
     QLabel,
-    QListWidget,
-    QListWidgetItem,
+    QLineEdit,
+    QListView,
     QPushButton,
     QSizePolicy,
     QSpacerItem,
     QTextBrowser,
+    QTextEdit,
     QVBoxLayout,
     QWidget,
 )
 
 try:
-    from .paths import LICENSES_PATH
+    from . import config, paths, perf
     from .utils import open_url
 except ImportError:
-    from paths import LICENSES_PATH  # type: ignore[no-redef]
+    import config  # type: ignore[no-redef]
+    import paths  # type: ignore[no-redef]
+    import perf  # type: ignore[no-redef]
     from utils import open_url  # type: ignore[no-redef]
 
+# Number of license texts kept in memory.
+LICENSE_CACHE_SIZE = 16
+# The search index written by `write_search_index`, stored in the
+# LICENSES_PATH. Not a .json file, so find_licenses doesn't pick it up.
+INDEX_NAME = "search.index"
+# Matches highlighted in a license text at most.
+MAX_HIGHLIGHTS = 500
+# Increased whenever the format of the search index changes.
+_INDEX_VERSION = 1
+# Files in the LICENSES_PATH that aren't part of the licenses.
+_NOT_LICENSES = {INDEX_NAME, "collect.cache"}
+_TOKEN_RE = re.compile(r"\w+")
+
+_search_index: "LicenseIndex | None" = None
+# The signature of the license files `_search_index` is up to date with.
+_search_index_signature: list[Any] | None = None
+_search_index_lock = threading.Lock()
+
 
-class License(NamedTuple):
+class _License(NamedTuple):
     name: str
-    content: str
+    content: str | None
     link: str
 
 
-def find_licenses() -> list[License]:
+class License(_License):
+    """
+    A `(name, content, link)` tuple. Licenses found by `find_licenses` only
+    know the path of their content file, it's read when the content is
+    first accessed, by attribute, index or unpacking.
+    """
+
+    # The file containing the license text, None if the text was given.
+    content_path: Path | None = None
+
+    def __new__(
+        cls,
+        name: str,
+        content: str | None = None,
+        link: str = "",
+        content_path: Path | None = None,
+    ) -> "License":
+        if content is None and content_path is None:
+            raise ValueError("Either a content or a content path is required")
+        license = super().__new__(cls, name, content, link)
+        license.content_path = content_path
+        return license
+
+    @property
+    def content(self) -> str:
+        """The license text, read from the content file on first access."""
+        text: str | None = tuple.__getitem__(self, 1)
+        if text is None:
+            assert self.content_path is not None
+            stat = self.content_path.stat()
+            text = _read_content(
+                self.content_path, stat.st_mtime_ns, stat.st_size
+            )
+        return text
+
+    def __iter__(self) -> Iterator[str]:
+        yield self.name
+        yield self.content
+        yield self.link
+
+    def __getitem__(self, index: Any) -> Any:
+        return tuple(self)[index]
+
+
+@functools.lru_cache(maxsize=LICENSE_CACHE_SIZE)
+def _read_content(path: Path, mtime_ns: int, size: int) -> str:
+    # The modification time and size are part of the key, so edited files
+    # are read again.
+    return path.read_text(encoding="utf-8")
+
+
+@perf.timed("licenses.find_licenses")
+def find_licenses(licenses_path: Path | None = None) -> list[License]:
     """
-    Find all licenses in the licenses directory.
+    Find all licenses in the licenses directory. Only the metadata is read,
+    the license texts are read when accessed.
 
-    :return: A dictionary of license names and their content and link.
-    :rtype: dict[str, str]
+    :param licenses_path: The licenses directory, defaults to LICENSES_PATH.
+    :type licenses_path: Path | None, optional
+    :raises ValueError: If a license has no name or no content.
+    :return: The licenses, sorted by name.
+    :rtype: list[License]
     """
+    if licenses_path is None:
+        licenses_path = paths.LICENSES_PATH
     licenses: list[License] = []
-    for item in sorted(LICENSES_PATH.iterdir()):
+    for item in sorted(licenses_path.iterdir()):
         if item.is_file() and item.suffix == ".json":
             meta = json.loads(item.read_text(encoding="utf-8"))
-            name = str(meta.get("name", None))
+            name = meta.get("name")
             if name is None:
                 raise ValueError(f"License file {item} has no name.")
-            content_file = str(meta.get("content_file", None))
-            if content_file is None:
-                content = str(meta.get("content_text", None))
-                if content is None:
-                    raise ValueError(
-                        f"License file {item} has no content_file or "
-                        "content_text."
-                    )
-            else:
-                content = (item.parent / content_file).read_text(
-                    encoding="utf-8"
+            content_file = meta.get("content_file")
+            content_text = meta.get("content_text")
+            if content_file is None and content_text is None:
+                raise ValueError(
+                    f"License file {item} has no content_file or "
+                    "content_text."
+                )
+            licenses.append(
+                License(
+                    name=str(name),
+                    content=(
+                        str(content_text) if content_file is None else None
+                    ),
+                    link=str(meta.get("link", "")),
+                    content_path=(
+                        item.parent / str(content_file)
+                        if content_file is not None
+                        else None
+                    ),
                 )
-            link = str(meta.get("link", ""))
-            licenses.append(License(name=name, content=content, link=link))
+            )
     return sorted(licenses, key=lambda x: x.name)
 
 
+def tokenize(text: str) -> list[str]:
+    """Split a text into the case-folded words used by the search index."""
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class LicenseIndex:
+    """
+    An inverted index of the words in the names and texts of the licenses.
+    Every word of a query matches the words it is a prefix of, a license
+    matches if it matches all words of the query.
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        postings: dict[str, list[int]],
+        signature: list[Any],
+    ) -> None:
+        """
+        :param names: The license names.
+        :type names: list[str]
+        :param postings: The indices into `names` of every word.
+        :type postings: dict[str, list[int]]
+        :param signature: Identifies the license files the index was built
+        from, see `_signature`.
+        :type signature: list[Any]
+        """
+        self.names = names
+        self.postings = postings
+        self.signature = signature
+        self._words = sorted(postings)
+
+    @classmethod
+    def build(
+        cls, licenses: Iterable[License], signature: list[Any]
+    ) -> "LicenseIndex":
+        names: list[str] = []
+        postings: dict[str, list[int]] = {}
+        for i, license in enumerate(licenses):
+            names.append(license.name)
+            for word in set(tokenize(f"{license.name} {license.content}")):
+                postings.setdefault(word, []).append(i)
+        return cls(names, postings, signature)
+
+    def search(self, query: str) -> set[str] | None:
+        """
+        Return the names of the licenses matching a query, None if the
+        query contains no words.
+        """
+        result: set[int] | None = None
+        for term in set(tokenize(query)):
+            matches = self._matches(term)
+            result = matches if result is None else result & matches
+            if not result:
+                break
+        if result is None:
+            return None
+        return {self.names[i] for i in result}
+
+    def _matches(self, term: str) -> set[int]:
+        matches: set[int] = set()
+        words = self._words
+        i = bisect.bisect_left(words, term)
+        while i < len(words) and words[i].startswith(term):
+            matches.update(self.postings[words[i]])
+            i += 1
+        return matches
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "version": _INDEX_VERSION,
+                "signature": self.signature,
+                "names": self.names,
+                "postings": self.postings,
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> "LicenseIndex":
+        """
+        :raises ValueError: If the text isn't a search index of the current
+        format.
+        """
+        data = json.loads(text)
+        if data.get("version") != _INDEX_VERSION:
+            raise ValueError("Outdated license search index")
+        return cls(data["names"], data["postings"], data["signature"])
+
+
+def license_files(licenses_path: Path) -> list[Path]:
+    """
+    Return the files making up the licenses, excluding the search index and
+    caches, sorted.
+    """
+    return sorted(
+        item
+        for item in licenses_path.iterdir()
+        if item.is_file() and item.name not in _NOT_LICENSES
+    )
+
+
+def _signature(licenses_path: Path) -> list[Any]:
+    """
+    Identify the license files by their names, sizes and modification
+    times.
+    """
+    signature = []
+    for item in license_files(licenses_path):
+        stat = item.stat()
+        signature.append([item.name, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def _shipped_signature(signature: list[Any]) -> list[Any]:
+    """
+    Leave the modification times out of a signature, as they aren't
+    preserved by every way of distributing an application. The index
+    written by `write_search_index` is identified by this signature.
+    """
+    return [entry[:2] for entry in signature]
+
+
+def _runtime_index_path() -> Path:
+    return paths.LIB_DIR / "license_index.json"
+
+
+def _read_index(path: Path, signature: list[Any]) -> LicenseIndex | None:
+    try:
+        index = LicenseIndex.from_json(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError, KeyError):
+        return None
+    return index if index.signature == signature else None
+
+
+@perf.timed("licenses.load_search_index")
+def load_search_index() -> LicenseIndex:
+    """
+    Return the search index of the licenses. The index written by
+    `write_search_index` is used if it is up to date. Otherwise the index
+    is built and cached in the LIB_DIR, if it exists. Reading all license
+    texts takes a while, so call this outside of the GUI thread.
+
+    :rtype: LicenseIndex
+    """
+    global _search_index, _search_index_signature
+    with _search_index_lock:
+        signature = _signature(paths.LICENSES_PATH)
+        if (
+            _search_index is not None
+            and _search_index_signature == signature
+        ):
+            return _search_index
+        index = _read_index(
+            paths.LICENSES_PATH / INDEX_NAME, _shipped_signature(signature)
+        ) or _read_index(_runtime_index_path(), signature)
+        if index is None:
+            index = LicenseIndex.build(find_licenses(), signature)
+            if paths.LIB_DIR.is_dir():
+                config._write_atomic(
+                    _runtime_index_path(),
+                    index.to_json(),
+                    mode=0o644,
+                    best_effort=True,
+                )
+        _search_index = index
+        _search_index_signature = signature
+        return index
+
+
+def write_search_index(licenses_path: Path | None = None) -> Path:
+    """
+    Build the search index and store it in the licenses directory, so it
+    doesn't have to be built at runtime. Run by
+    `pyqt-utils --collect-licenses` and `pyqt-utils --index-licenses`.
+
+    :param licenses_path: The licenses directory, defaults to LICENSES_PATH.
+    :type licenses_path: Path | None, optional
+    :raises OSError: If the index can't be written.
+    :return: The path of the index.
+    :rtype: Path
+    """
+    if licenses_path is None:
+        licenses_path = paths.LICENSES_PATH
+    path = licenses_path / INDEX_NAME
+    index = LicenseIndex.build(
+        find_licenses(licenses_path),
+        _shipped_signature(_signature(licenses_path)),
+    )
+    config._write_atomic(path, index.to_json(), mode=0o644)
+    return path
+
+
+class LicenseModel(QAbstractListModel):
+    """
+    A list model of licenses. The license of an index is available via
+    `license` or the `Qt.ItemDataRole.UserRole`.
+    """
+
+    def __init__(
+        self,
+        licenses: list[License] | None = None,
+        parent: QObject | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self.licenses = licenses if licenses is not None else []
+        self.tooltip_format = "{link}"
+
+    def set_licenses(self, licenses: list[License]) -> None:
+        self.beginResetModel()
+        self.licenses = licenses
+        self.endResetModel()
+
+    def set_tooltip_format(self, tooltip_format: str) -> None:
+        """
+        :param tooltip_format: The tooltip of the licenses, `{link}` is
+        replaced by their link.
+        :type tooltip_format: str
+        """
+        self.tooltip_format = tooltip_format
+        if self.licenses:
+            self.dataChanged.emit(
+                self.index(0),
+                self.index(len(self.licenses) - 1),
+                [Qt.ItemDataRole.ToolTipRole],
+            )
+
+    def license(self, index: QModelIndex) -> License | None:
+        if not index.isValid() or index.row() >= len(self.licenses):
+            return None
+        return self.licenses[index.row()]
+
+    def rowCount(
+        self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()
+    ) -> int:
+        return 0 if parent.isValid() else len(self.licenses)
+
+    def data(
+        self,
+        index: QModelIndex | QPersistentModelIndex,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> Any:
+        if not index.isValid() or index.row() >= len(self.licenses):
+            return None
+        license = self.licenses[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return license.name
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self.tooltip_format.format(link=license.link)
+        if role == Qt.ItemDataRole.UserRole:
+            return license
+        return None
+
+
+class _SearchIndexLoader(QObject):
+    """
+    Loads the search index in a worker thread. Lives as long as the
+    application, so the worker never emits on a deleted object.
+    """
+
+    # Emitted with the search index, or the exception that occurred while
+    # loading it.
+    loaded = pyqtSignal(object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Load the index unless it is already being loaded."""
+        with self._lock:
+            if self._loading:
+                return
+            self._loading = True
+        threading.Thread(
+            target=self._load, name="LicenseIndexLoader", daemon=True
+        ).start()
+
+    def _load(self) -> None:
+        try:
+            result: LicenseIndex | BaseException = load_search_index()
+        except Exception as e:
+            result = e
+        finally:
+            with self._lock:
+                self._loading = False
+        try:
+            self.loaded.emit(result)
+        except RuntimeError:
+            # The application is shutting down.
+            pass
+
+
+_loader: _SearchIndexLoader | None = None
+
+
+def _search_index_loader() -> _SearchIndexLoader:
+    global _loader
+    if _loader is None:
+        _loader = _SearchIndexLoader()
+    return _loader
+
+
 class LicenseViewer(QDialog):
     def __init__(self, parent: QWidget) -> None:
-        super().__init__(parent)
-        self.licenses = find_licenses()
-        self.double_tap_hint = "{link}"
-        self.setupUi()
-        self.connectSignalsSlots()
-        self.retranslateUi()
-        self.setup_licenses()
+        with perf.span("licenses.LicenseViewer"):
+            super().__init__(parent)
+            self.licenses = find_licenses()
+            self.double_tap_hint = "{link}"
+            self.search_index: LicenseIndex | None = None
+            self.setupUi()
+            self.connectSignalsSlots()
+            self.retranslateUi()
+            self.setup_licenses()
+            self._load_search_index()
 
     def setupUi(self) -> None:
         self.setWindowTitle("Licenses")
@@ -92,10 +502,19 @@ class LicenseViewer(QDialog):
             20, 10, QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Fixed
         )
         self.verticalLayout.addItem(self.verticalSpacer)
+        self.search = QLineEdit(self)
+        self.search.setObjectName("search")
+        self.search.setClearButtonEnabled(True)
+        self.verticalLayout.addWidget(self.search)
         self.horizontalLayout_2 = QHBoxLayout()
         self.horizontalLayout_2.setObjectName("horizontalLayout_2")
-        self.list = QListWidget(self)
+        self.list = QListView(self)
         self.list.setObjectName("list")
+        self.model = LicenseModel(parent=self)
+        self.list.setModel(self.model)
+        # All rows have the same height, so the view doesn't need to
+        # measure every row.
+        self.list.setUniformItemSizes(True)
         self.list.setMaximumSize(QSize(200, 16777215))
         self.list.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.list.setProperty("showDropIndicator", False)
@@ -119,33 +538,132 @@ class LicenseViewer(QDialog):
         self.closeBtn.clicked.connect(self.close)
 
     def connectSignalsSlots(self) -> None:
-        self.list.itemSelectionChanged.connect(self.show_license)
-        self.list.itemDoubleClicked.connect(self.double_clicked)
+        selection_model = self.list.selectionModel()
+        assert selection_model is not None
+        selection_model.selectionChanged.connect(self.show_license)
+        self.list.doubleClicked.connect(self.double_clicked)
+        self.search.textChanged.connect(self.filter_licenses)
 
     def show_license(self) -> None:
+        selection_model = self.list.selectionModel()
+        if selection_model is None or not selection_model.hasSelection():
+            return
+        license = self.model.license(selection_model.selectedIndexes()[0])
+        if license is None:
+            return
         try:
-            selected = self.list.selectedItems()[0]
-        except IndexError:
+            self.browser.setText(license.content)
+        except OSError as e:
+            config.log(
+                f"Failed to read the license {license.name}: {e}", "ERROR"
+            )
+            self.browser.clear()
+        self.highlight_matches()
+
+    def filter_licenses(self) -> None:
+        """
+        Show only the licenses matching the search query. Until the search
+        index is loaded, only the names are searched.
+        """
+        query = self.search.text()
+        if self.search_index is not None:
+            names = self.search_index.search(query)
+        else:
+            names = LicenseIndex.build(
+                (
+                    License(license.name, "", license.link)
+                    for license in self.licenses
+                ),
+                [],
+            ).search(query)
+        selected = self.model.license(self.list.currentIndex())
+        self.model.set_licenses(
+            self.licenses
+            if names is None
+            else [
+                license for license in self.licenses if license.name in names
+            ]
+        )
+        if selected is not None and selected in self.model.licenses:
+            self.list.setCurrentIndex(
+                self.model.index(self.model.licenses.index(selected))
+            )
+        else:
+            self.browser.clear()
+
+    def highlight_matches(self) -> None:
+        """Highlight the words matching the search query in the browser."""
+        selections: list[QTextEdit.ExtraSelection] = []
+        terms = sorted(set(tokenize(self.search.text())))
+        if terms:
+            pattern = re.compile(
+                r"\b(?:" + "|".join(map(re.escape, terms)) + r")\w*",
+                re.IGNORECASE,
+            )
+            document = self.browser.document()
+            assert document is not None
+            text = document.toPlainText()
+            char_format = QTextCharFormat()
+            char_format.setBackground(QColor(Qt.GlobalColor.yellow))
+            char_format.setForeground(QColor(Qt.GlobalColor.black))
+            for match in pattern.finditer(text):
+                if len(selections) >= MAX_HIGHLIGHTS:
+                    break
+                selection = QTextEdit.ExtraSelection()
+                selection.cursor = self.browser.textCursor()
+                selection.cursor.setPosition(match.start())
+                selection.cursor.setPosition(
+                    match.end(), selection.cursor.MoveMode.KeepAnchor
+                )
+                selection.format = char_format
+                selections.append(selection)
+            if selections:
+                cursor = self.browser.textCursor()
+                cursor.setPosition(selections[0].cursor.selectionStart())
+                self.browser.setTextCursor(cursor)
+                self.browser.ensureCursorVisible()
+        self.browser.setExtraSelections(selections)
+
+    def _load_search_index(self) -> None:
+        loader = _search_index_loader()
+        loader.loaded.connect(self._on_index_loaded)
+        loader.load()
+
+    def _on_index_loaded(self, result: LicenseIndex | BaseException) -> None:
+        if isinstance(result, BaseException):
+            config.log(
+                f"Failed to load the license search index: {result}", "ERROR"
+            )
             return
-        for license in self.licenses:
-            if license.name == selected.text():
-                self.browser.setText(license.content)
-                return
+        self.search_index = result
+        if self.search.text():
+            self.filter_licenses()
 
-    def double_clicked(self, item: QListWidgetItem) -> None:
-        for license in self.licenses:
-            if license.name == item.text():
-                open_url(license.link)
+    def double_clicked(self, index: QModelIndex) -> None:
+        license = self.model.license(index)
+        if license is not None:
+            open_url(license.link)
 
     def retranslateUi(self) -> None:
-        """Override this method if you need localization support."""
-        self.title.setText("Licenses")
-        self.closeBtn.setText("Close")
-        self.double_tap_hint = "{link} (Double tap to open)"
+        """
+        Called again whenever the language changes, see
+        `pyqt_utils.i18n`. The texts are translated in the "LicenseViewer"
+        context. Override this method to translate them differently.
+        """
+        _translate = QCoreApplication.translate
+        self.title.setText(_translate("LicenseViewer", "Licenses"))
+        self.closeBtn.setText(_translate("LicenseViewer", "Close"))
+        self.search.setPlaceholderText(_translate("LicenseViewer", "Search"))
+        self.double_tap_hint = _translate(
+            "LicenseViewer", "{link} (Double tap to open)"
+        )
+
+    def changeEvent(self, event: QEvent | None) -> None:
+        if event is not None and event.type() == QEvent.Type.LanguageChange:
+            self.retranslateUi()
+            self.model.set_tooltip_format(self.double_tap_hint)
+        super().changeEvent(event)
 
     def setup_licenses(self) -> None:
-        self.list.clear()
-        for license in self.licenses:
-            item = QListWidgetItem(license.name)
-            item.setToolTip(self.double_tap_hint.format(link=license.link))
-            self.list.addItem(item)
+        self.model.set_tooltip_format(self.double_tap_hint)
+        self.model.set_licenses(self.licenses)
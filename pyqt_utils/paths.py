@@ -1,66 +1,145 @@
+import os
 import platform
+import sys
+from collections.abc import Callable
 from pathlib import Path
 
-from PyQt6.QtCore import QStandardPaths
-
 try:
-    from .app_conf import app_name, root_file
+    from . import app_conf
 except ImportError:
-    from app_conf import app_name, root_file  # type: ignore[no-redef]
-
-if not app_name:
-    raise RuntimeError(
-        "The application name must be set before importing the paths module. "
-        "Use `pyqt_utils.init_app(...)`."
-    )
-if not root_file:
-    raise RuntimeError(
-        "The application root file must be set before importing the paths "
-        "module. Use `pyqt_utils.init_app(...)`."
-    )
-
-ROOT_PATH = Path(root_file).parent
-if "__compiled__" in globals():
-    # With nuitka, __file__ will show the file in a subfolder that doesn't
-    # exist.
-    # With nuitka: app_name.dist/app_name/paths.py
-    # Actual: app_name.dist/paths.py
-    # That's why we go back another folder using .parent twice.
-    ROOT_PATH = Path(root_file).parent.parent
-VERSION_PATH = ROOT_PATH / "version.txt"
-STYLES_PATH = ROOT_PATH / "styles"
-ICONS_PATH = ROOT_PATH / "icons"
-LANGS_PATH = ROOT_PATH / "langs"
-LICENSES_PATH = ROOT_PATH / "licenses"
-
-CONFIG_DIR = (
-    Path(
-        QStandardPaths.writableLocation(
-            QStandardPaths.StandardLocation.AppDataLocation
+    import app_conf  # type: ignore[no-redef]
+
+# All paths are resolved on first access and cached afterwards, so importing
+# this module neither imports Qt nor touches the file system.
+ROOT_PATH: Path
+VERSION_PATH: Path
+STYLES_PATH: Path
+ICONS_PATH: Path
+LANGS_PATH: Path
+LICENSES_PATH: Path
+CONFIG_DIR: Path
+LIB_DIR: Path
+CONFIG_PATH: Path
+CONFIG_JOURNAL_PATH: Path
+CONFIG_DB_PATH: Path
+LOGGER_PATH: Path
+
+_COMPILED = "__compiled__" in globals()
+
+
+def _app_name() -> str:
+    if not app_conf.app_name:
+        raise RuntimeError(
+            "The application name must be set before using the paths "
+            "module. Use `pyqt_utils.init_app(...)`."
         )
-    )
-    / app_name
-)
-
-if platform.system() == "Windows":
-    LIB_DIR = (
-        Path(
-            QStandardPaths.writableLocation(
-                QStandardPaths.StandardLocation.AppLocalDataLocation
-            )
+    return app_conf.app_name
+
+
+def _root_path() -> Path:
+    if not app_conf.root_file:
+        raise RuntimeError(
+            "The application root file must be set before using the paths "
+            "module. Use `pyqt_utils.init_app(...)`."
+        )
+    if _COMPILED:
+        # With nuitka, __file__ will show the file in a subfolder that doesn't
+        # exist.
+        # With nuitka: app_name.dist/app_name/paths.py
+        # Actual: app_name.dist/paths.py
+        # That's why we go back another folder using .parent twice.
+        return Path(app_conf.root_file).parent.parent
+    return Path(app_conf.root_file).parent
+
+
+def writable_location(location: str) -> Path:
+    """
+    Return the same path as `QStandardPaths.writableLocation` for the
+    "AppDataLocation", "AppLocalDataLocation" and "HomeLocation" locations.
+
+    The path is determined without Qt and matches Qt's result when no
+    organization or application name is set, like before a
+    QCoreApplication exists. Qt isn't asked even if it was imported, as it
+    adds the name of the application afterwards and the path would differ
+    between processes.
+
+    :param location: The name of the QStandardPaths.StandardLocation.
+    :type location: str
+    :return: The path.
+    :rtype: Path
+    """
+    home = Path.home()
+    if location == "HomeLocation":
+        return home
+    system = platform.system()
+    if system == "Windows":
+        if location == "AppLocalDataLocation":
+            local = os.environ.get("LOCALAPPDATA")
+            return Path(local) if local else home / "AppData" / "Local"
+        roaming = os.environ.get("APPDATA")
+        return Path(roaming) if roaming else home / "AppData" / "Roaming"
+    if system == "Darwin":
+        return home / "Library" / "Application Support"
+    xdg_data_home = os.environ.get("XDG_DATA_HOME")
+    if xdg_data_home and Path(xdg_data_home).is_absolute():
+        return Path(xdg_data_home)
+    return home / ".local" / "share"
+
+
+def _app_dir(location: str, *parts: str) -> Path:
+    """
+    Return `parts` joined to a standard location.
+
+    Before, the location came from QStandardPaths if Qt was imported, which
+    includes the organization and application name once they're set. If the
+    directory only exists in that location, it is used, so applications
+    setting those names before using the paths keep their files.
+    """
+    path = writable_location(location).joinpath(*parts)
+    if path.exists() or "PyQt6.QtCore" not in sys.modules:
+        return path
+    from PyQt6.QtCore import QStandardPaths
+
+    qt_path = Path(
+        QStandardPaths.writableLocation(
+            getattr(QStandardPaths.StandardLocation, location)
         )
-        / app_name
-        / "lib"
-    )
-else:
-    LIB_DIR = (
-        Path(
-            QStandardPaths.writableLocation(
-                QStandardPaths.StandardLocation.HomeLocation
-            )
+    ).joinpath(*parts)
+    return qt_path if qt_path.is_dir() else path
+
+
+def _lib_dir() -> Path:
+    if platform.system() == "Windows":
+        return _app_dir("AppLocalDataLocation", _app_name(), "lib")
+    return _app_dir("HomeLocation", f".{_app_name()}", "lib")
+
+
+_RESOLVERS: dict[str, Callable[[], Path]] = {
+    "ROOT_PATH": _root_path,
+    "VERSION_PATH": lambda: _resolve("ROOT_PATH") / "version.txt",
+    "STYLES_PATH": lambda: _resolve("ROOT_PATH") / "styles",
+    "ICONS_PATH": lambda: _resolve("ROOT_PATH") / "icons",
+    "LANGS_PATH": lambda: _resolve("ROOT_PATH") / "langs",
+    "LICENSES_PATH": lambda: _resolve("ROOT_PATH") / "licenses",
+    "CONFIG_DIR": lambda: _app_dir("AppDataLocation", _app_name()),
+    "LIB_DIR": _lib_dir,
+    "CONFIG_PATH": lambda: _resolve("CONFIG_DIR") / "config.json",
+    "CONFIG_JOURNAL_PATH": lambda: _resolve("CONFIG_DIR") / "config.journal",
+    "CONFIG_DB_PATH": lambda: _resolve("CONFIG_DIR") / "config.sqlite3",
+    "LOGGER_PATH": lambda: _resolve("CONFIG_DIR") / "latest.log",
+}
+
+
+def _resolve(name: str) -> Path:
+    value: Path | None = globals().get(name)
+    if value is None:
+        value = globals()[name] = _RESOLVERS[name]()
+    return value
+
+
+def __getattr__(name: str) -> Path:
+    if name not in _RESOLVERS:
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}"
         )
-        / f".{app_name}"
-        / "lib"
-    )
-CONFIG_PATH = CONFIG_DIR / "config.json"
-LOGGER_PATH = CONFIG_DIR / "latest.log"
+    return _resolve(name)
@@ -0,0 +1,297 @@
+"""
+Lightweight instrumentation for hot paths: timed spans, counters and
+histograms, summarized through the config log or exported as JSON.
+
+Instrumentation is disabled by default. Set the `PYQT_UTILS_PERF`
+environment variable to `1` or call `enable()` before importing the code you
+want to measure: functions decorated with `timed` while disabled are
+returned unchanged and cost nothing, `span` returns a shared no-op context
+manager and `count`/`observe` return immediately.
+"""
+
+import atexit
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+from pathlib import Path
+from types import TracebackType
+from typing import Any, ParamSpec, TypeVar
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# Histogram buckets per power of two.
+BUCKETS_PER_OCTAVE = 4
+
+_enabled = os.environ.get("PYQT_UTILS_PERF", "") not in ("", "0")
+_lock = threading.Lock()
+_counters: dict[str, int] = {}
+_histograms: dict[str, "_Histogram"] = {}
+_dumper: "_Dumper | None" = None
+_exit_registered = False
+_NULL_SPAN: AbstractContextManager[None] = nullcontext()
+
+
+class _Histogram:
+    """
+    Count, sum, extremes and logarithmic buckets of the observed values.
+    Percentiles are estimated from the buckets.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets: dict[int, int] = {}
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        bucket = (
+            math.floor(math.log2(value) * BUCKETS_PER_OCTAVE)
+            if value > 0
+            else -(2**31)
+        )
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, p: float) -> float:
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                upper = 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE)
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class _Span:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._start = 0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter_ns()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        observe(self.name, (time.perf_counter_ns() - self._start) / 1e6)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(dump_interval: float | None = 300.0) -> None:
+    """
+    Enable instrumentation. Only affects functions decorated with `timed`
+    after this call.
+
+    :param dump_interval: Seconds between summaries written to the log, None
+    to only write a summary on exit, defaults to 300.0
+    :type dump_interval: float | None, optional
+    """
+    global _enabled, _dumper, _exit_registered
+    _enabled = True
+    if not _exit_registered:
+        atexit.register(_dump_on_exit)
+        _exit_registered = True
+    if _dumper is not None:
+        _dumper.stop()
+        _dumper = None
+    if dump_interval is not None:
+        _dumper = _Dumper(dump_interval)
+        _dumper.start()
+
+
+def disable() -> None:
+    global _enabled, _dumper
+    _enabled = False
+    if _dumper is not None:
+        _dumper.stop()
+        _dumper = None
+
+
+def reset() -> None:
+    """Forget all collected counters and histograms."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def span(name: str) -> AbstractContextManager[None]:
+    """
+    Return a context manager recording the time spent in its block, in
+    milliseconds, in the histogram `name`.
+
+    :param name: The name of the span, e.g. "config.write".
+    :type name: str
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(
+    name: str | None = None,
+) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    """
+    Decorator recording the duration of every call like `span`. Returns the
+    function unchanged if instrumentation is disabled.
+
+    :param name: The name of the span, defaults to the qualified name of the
+    function.
+    :type name: str | None, optional
+    """
+
+    def decorator(func: Callable[P, R]) -> Callable[P, R]:
+        if not _enabled:
+            return func
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with _Span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name: str, n: int = 1) -> None:
+    """Increase the counter `name` by `n`."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(name: str, value: float) -> None:
+    """Add `value` to the histogram `name`."""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = _Histogram()
+        histogram.add(value)
+
+
+def stats() -> dict[str, Any]:
+    """
+    Return the collected statistics.
+
+    :return: A dictionary with the "counters" and summaries of the
+    "histograms".
+    :rtype: dict[str, Any]
+    """
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {
+                name: histogram.summary()
+                for name, histogram in _histograms.items()
+            },
+        }
+
+
+def dump() -> None:
+    """Write a summary of the collected statistics to the log."""
+    try:
+        from . import config
+    except ImportError:
+        import config  # type: ignore[no-redef]
+
+    data = stats()
+    for name, value in sorted(data["counters"].items()):
+        config.log("perf %s: %d", "INFO", name, value)
+    for name, summary in sorted(data["histograms"].items()):
+        config.log(
+            "perf %s: n=%d total=%.1fms mean=%.3fms p50=%.3fms p95=%.3fms "
+            "p99=%.3fms max=%.3fms",
+            "INFO",
+            name,
+            summary["count"],
+            summary["total"],
+            summary["mean"],
+            summary["p50"],
+            summary["p95"],
+            summary["p99"],
+            summary["max"],
+        )
+
+
+def export_json(path: str | Path | None = None) -> Path:
+    """
+    Write the collected statistics to a JSON file.
+
+    :param path: The file to write, defaults to perf.json next to the log
+    file.
+    :type path: str | Path | None, optional
+    :return: The path of the written file.
+    :rtype: Path
+    """
+    if path is None:
+        try:
+            from .paths import LOGGER_PATH
+        except ImportError:
+            from paths import LOGGER_PATH  # type: ignore[no-redef]
+        path = LOGGER_PATH.with_name("perf.json")
+    path = Path(path)
+    path.write_text(json.dumps(stats(), indent=2), encoding="utf-8")
+    return path
+
+
+def _dump_on_exit() -> None:
+    if not _enabled or not (_counters or _histograms):
+        return
+    dump()
+    try:
+        export_json()
+    except OSError:
+        pass
+
+
+class _Dumper(threading.Thread):
+    """Periodically writes a summary to the log."""
+
+    def __init__(self, interval: float) -> None:
+        super().__init__(name="PerfDumper", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            dump()
+
+
+if _enabled:
+    enable()
@@ -0,0 +1,264 @@
+"""
+Incremental builds for the `pyqt-utils` steps.
+
+Every target, e.g. a compiled .ui file, is recorded in a manifest in the
+package with the content hashes of its inputs and outputs, the version of
+the tool that built it and the options it was built with. A target is only
+built again if one of them changed or an output is missing. Hashes are only
+computed again for files whose size or modification time changed, so
+checking an unchanged project is cheap.
+"""
+
+import hashlib
+import json
+import subprocess
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+from pyqt_utils import config
+
+MANIFEST_NAME = ".pyqt-utils-build.json"
+# Increased whenever the format of the manifest changes.
+_MANIFEST_VERSION = 1
+
+# The modification time, size and content hash of a file.
+_FileEntry = list[Any]
+
+
+def _hash(path: Path) -> str:
+    with path.open("rb") as fp:
+        return hashlib.file_digest(
+            fp, lambda: hashlib.blake2b(digest_size=16)
+        ).hexdigest()
+
+
+class BuildCache:
+    """
+    The manifest of the built targets of a package. Use `run` to build a
+    target only if it is outdated, or `outdated` and `record` to build
+    several targets at once.
+    """
+
+    def __init__(
+        self, root: Path, force: bool = False, explain: bool = False
+    ) -> None:
+        """
+        :param root: The package. The manifest is stored in it and paths
+        are recorded relative to it.
+        :type root: Path
+        :param force: Consider every target outdated, defaults to False
+        :type force: bool, optional
+        :param explain: Print why every target is built or why it is up to
+        date, defaults to False
+        :type explain: bool, optional
+        """
+        self.root = root
+        self.path = root / MANIFEST_NAME
+        self.force = force
+        self.explain = explain
+        self._targets: dict[str, Any] = self._load()
+        self._tool_versions: dict[tuple[str, ...], str] = {}
+        # Whether the recorded modification times of unchanged files were
+        # updated, so they aren't hashed again next time.
+        self._refreshed = False
+
+    def _load(self) -> dict[str, Any]:
+        try:
+            manifest = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != _MANIFEST_VERSION:
+            return {}
+        return dict(manifest.get("targets", {}))
+
+    def save(self) -> None:
+        """Atomically write the manifest."""
+        config._write_atomic(
+            self.path,
+            json.dumps(
+                {"version": _MANIFEST_VERSION, "targets": self._targets},
+                indent=1,
+                sort_keys=True,
+            ),
+            mode=0o644,
+        )
+
+    def tool_version(self, *command: str) -> str:
+        """
+        Return the output of a command printing the version of a tool, e.g.
+        `tool_version("rcc", "--version")`. Only run once per command.
+        """
+        if command not in self._tool_versions:
+            try:
+                process = subprocess.run(
+                    command, capture_output=True, text=True, timeout=30
+                )
+                version = (process.stdout + process.stderr).strip()
+            except (OSError, subprocess.SubprocessError):
+                version = ""
+            self._tool_versions[command] = version or "unknown"
+        return self._tool_versions[command]
+
+    def _key(self, path: Path) -> str:
+        path = path.resolve()
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return str(path)
+
+    def _file_entry(
+        self, path: Path, previous: _FileEntry | None
+    ) -> _FileEntry | None:
+        """Return the entry of a file, None if it doesn't exist."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if (
+            previous is not None
+            and previous[0] == stat.st_mtime_ns
+            and previous[1] == stat.st_size
+        ):
+            return previous
+        return [stat.st_mtime_ns, stat.st_size, _hash(path)]
+
+    def outdated(
+        self,
+        target: str,
+        inputs: Iterable[Path],
+        outputs: Iterable[Path],
+        tool: str = "",
+        options: Any = None,
+    ) -> str | None:
+        """
+        Check whether a target has to be built.
+
+        :param target: The name of the target, unique within the package.
+        :type target: str
+        :param inputs: The files the target is built from.
+        :type inputs: Iterable[Path]
+        :param outputs: The files written when building the target.
+        :type outputs: Iterable[Path]
+        :param tool: The version of the tool building the target, see
+        `tool_version`.
+        :type tool: str, optional
+        :param options: The options the target is built with, must be JSON
+        serializable.
+        :type options: Any, optional
+        :return: Why the target has to be built, None if it is up to date.
+        :rtype: str | None
+        """
+        reason = self._reason(target, inputs, outputs, tool, options)
+        if reason is None and self._refreshed:
+            self.save()
+            self._refreshed = False
+        if self.explain:
+            print(f"{target}: {reason or 'up to date'}")
+        return reason
+
+    def _reason(
+        self,
+        target: str,
+        inputs: Iterable[Path],
+        outputs: Iterable[Path],
+        tool: str,
+        options: Any,
+    ) -> str | None:
+        if self.force:
+            return "forced"
+        entry = self._targets.get(target)
+        if entry is None:
+            return "never built"
+        if entry["tool"] != tool:
+            return "the tool version changed"
+        if entry["options"] != json.loads(json.dumps(options)):
+            return "the options changed"
+        recorded_inputs: dict[str, _FileEntry] = entry["inputs"]
+        input_keys = {self._key(path): path for path in inputs}
+        added = sorted(input_keys.keys() - recorded_inputs.keys())
+        if added:
+            return f"{added[0]} was added"
+        removed = sorted(recorded_inputs.keys() - input_keys.keys())
+        if removed:
+            return f"{removed[0]} was removed"
+        for key, path in sorted(input_keys.items()):
+            current = self._file_entry(path, recorded_inputs[key])
+            if current is None:
+                return f"{key} is missing"
+            if current[2] != recorded_inputs[key][2]:
+                return f"{key} changed"
+            self._refresh(recorded_inputs, key, current)
+        recorded_outputs: dict[str, _FileEntry] = entry["outputs"]
+        for path in outputs:
+            key = self._key(path)
+            current = self._file_entry(path, recorded_outputs.get(key))
+            if current is None:
+                return f"{key} is missing"
+            if key not in recorded_outputs:
+                return f"{key} wasn't built before"
+            if current[2] != recorded_outputs[key][2]:
+                return f"{key} was modified"
+            self._refresh(recorded_outputs, key, current)
+        return None
+
+    def _refresh(
+        self, entries: dict[str, _FileEntry], key: str, current: _FileEntry
+    ) -> None:
+        if entries[key] is not current:
+            entries[key] = current
+            self._refreshed = True
+
+    def record(
+        self,
+        target: str,
+        inputs: Iterable[Path],
+        outputs: Iterable[Path],
+        tool: str = "",
+        options: Any = None,
+    ) -> None:
+        """
+        Record that a target was built and save the manifest. See
+        `outdated` for the parameters.
+        """
+        previous = self._targets.get(target, {})
+        entries: dict[str, dict[str, _FileEntry]] = {}
+        for kind, paths in (("inputs", inputs), ("outputs", outputs)):
+            entries[kind] = {}
+            for path in paths:
+                key = self._key(path)
+                entry = self._file_entry(
+                    path, previous.get(kind, {}).get(key)
+                )
+                if entry is not None:
+                    entries[kind][key] = entry
+        self._targets[target] = {
+            "tool": tool,
+            "options": json.loads(json.dumps(options)),
+            **entries,
+        }
+        self.save()
+
+    def run(
+        self,
+        target: str,
+        inputs: Iterable[Path],
+        outputs: Iterable[Path],
+        action: Callable[[], object],
+        tool: str = "",
+        options: Any = None,
+    ) -> bool:
+        """
+        Build a target by calling `action` if it is outdated. See
+        `outdated` for the other parameters.
+
+        :return: Whether the target was built.
+        :rtype: bool
+        """
+        inputs = list(inputs)
+        outputs = list(outputs)
+        if self.outdated(target, inputs, outputs, tool, options) is None:
+            return False
+        action()
+        self.record(target, inputs, outputs, tool, options)
+        return True
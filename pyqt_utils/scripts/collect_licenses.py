@@ -0,0 +1,247 @@
+"""
+Driver of `pyqt-utils --collect-licenses`.
+
+Enumerates the installed distributions using `importlib.metadata` and writes
+a `<name>.json` and `<name>.txt` per distribution into the licenses
+directory, in the layout read by `pyqt_utils.licenses.find_licenses`. The
+license files and metadata are extracted by a pool of worker threads.
+Results are cached per distribution and version, so later runs only
+extract distributions that were added, updated or removed.
+"""
+
+import json
+import os
+import re
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from importlib import metadata
+from pathlib import Path
+from typing import Any, NamedTuple
+
+# Not a .json file, so find_licenses doesn't pick it up.
+CACHE_NAME = "collect.cache"
+# Increased whenever the output or the cache format changes.
+_CACHE_VERSION = 1
+_LICENSE_FILE_RE = re.compile(r"^(licen[cs]e|copying|notice)", re.IGNORECASE)
+# Labels of project URLs used as the link, in order of preference.
+_LINK_LABELS = ("homepage", "home", "source", "source code", "repository")
+
+
+class Collected(NamedTuple):
+    # The normalized distribution name, also used as the file name.
+    key: str
+    version: str
+    name: str
+    link: str
+    content: str
+
+
+def normalize(name: str) -> str:
+    """Normalize a distribution name as specified by PEP 503."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _link(dist: metadata.Distribution) -> str:
+    urls: dict[str, str] = {}
+    for entry in dist.metadata.get_all("Project-URL") or []:
+        label, _, url = str(entry).partition(",")
+        urls.setdefault(label.strip().lower(), url.strip())
+    for label in _LINK_LABELS:
+        if label in urls:
+            return urls[label]
+    home_page = dist.metadata.get("Home-page")
+    if home_page and home_page != "UNKNOWN":
+        return str(home_page)
+    if urls:
+        return next(iter(urls.values()))
+    return f"https://pypi.org/project/{normalize(dist.metadata['Name'])}/"
+
+
+def _license_texts(dist: metadata.Distribution) -> list[str]:
+    """
+    Return the license files shipped in the .dist-info directory, those
+    declared as License-File in the metadata first.
+    """
+    declared = dist.metadata.get_all("License-File") or []
+    found: dict[str, str] = {}
+    others: dict[str, str] = {}
+    for file in dist.files or []:
+        parts = file.parts
+        if len(parts) < 2 or not parts[0].endswith(".dist-info"):
+            continue
+        relative = "/".join(
+            parts[2:] if parts[1] == "licenses" else parts[1:]
+        )
+        if relative in declared:
+            target = found
+        elif _LICENSE_FILE_RE.match(file.name):
+            target = others
+        else:
+            continue
+        try:
+            text = file.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError):
+            continue
+        target[relative] = text.strip()
+    ordered = [found[name] for name in declared if name in found]
+    return ordered + [text for text in others.values() if text]
+
+
+def extract(dist: metadata.Distribution) -> Collected:
+    """
+    Extract the license of a distribution. If it doesn't ship license
+    files, the license declared in its metadata is used instead.
+
+    :param dist: The distribution.
+    :type dist: metadata.Distribution
+    :rtype: Collected
+    """
+    name = str(dist.metadata["Name"])
+    texts = _license_texts(dist)
+    if not texts:
+        declared = [
+            str(value)
+            for value in (
+                dist.metadata.get("License-Expression"),
+                dist.metadata.get("License"),
+            )
+            if value and value != "UNKNOWN"
+        ] + [
+            classifier.rpartition(" :: ")[2]
+            for classifier in dist.metadata.get_all("Classifier") or []
+            if classifier.startswith("License ::")
+        ]
+        texts = declared or ["No license information found."]
+    return Collected(
+        key=normalize(name),
+        version=dist.version,
+        name=name,
+        link=_link(dist),
+        content="\n\n".join(dict.fromkeys(texts)) + "\n",
+    )
+
+
+def installed_distributions(
+    exclude: Iterable[str] = (),
+) -> dict[str, metadata.Distribution]:
+    """
+    Return the installed distributions by their normalized name. If a
+    distribution is installed multiple times, the one found first on
+    sys.path is used, like by the import system.
+    """
+    excluded = {normalize(name) for name in exclude}
+    distributions: dict[str, metadata.Distribution] = {}
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if not name:
+            continue
+        key = normalize(name)
+        if key not in excluded:
+            distributions.setdefault(key, dist)
+    return distributions
+
+
+def _load_cache(path: Path) -> dict[str, Any]:
+    try:
+        cache: dict[str, Any] = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != _CACHE_VERSION:
+        return {}
+    return dict(cache.get("distributions", {}))
+
+
+def _write(licenses_path: Path, collected: Collected) -> None:
+    (licenses_path / f"{collected.key}.txt").write_text(
+        collected.content, encoding="utf-8"
+    )
+    (licenses_path / f"{collected.key}.json").write_text(
+        json.dumps(
+            {
+                "name": collected.name,
+                "content_file": f"{collected.key}.txt",
+                "link": collected.link,
+            },
+            indent=4,
+        )
+        + "\n",
+        encoding="utf-8",
+    )
+
+
+def collect_licenses(
+    licenses_path: Path,
+    exclude: Iterable[str] = (),
+    workers: int | None = None,
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    Write the licenses of all installed distributions to the licenses
+    directory. Files that weren't written by this function are never
+    overwritten or removed.
+
+    :param licenses_path: The licenses directory.
+    :type licenses_path: Path
+    :param exclude: Names of distributions to leave out, e.g. build tools.
+    :type exclude: Iterable[str], optional
+    :param workers: The number of worker threads, defaults to the number of
+    CPUs.
+    :type workers: int | None, optional
+    :return: The names of the updated, unchanged and removed distributions.
+    :rtype: tuple[list[str], list[str], list[str]]
+    """
+    licenses_path.mkdir(parents=True, exist_ok=True)
+    cache_path = licenses_path / CACHE_NAME
+    cache = _load_cache(cache_path)
+    distributions = installed_distributions(exclude)
+
+    unchanged = []
+    outdated = []
+    for key, dist in sorted(distributions.items()):
+        json_file = licenses_path / f"{key}.json"
+        entry = cache.get(key)
+        if entry is None and json_file.exists():
+            print(f"Keeping {json_file.name}, it wasn't collected")
+            continue
+        if (
+            entry is not None
+            and entry.get("version") == dist.version
+            and json_file.exists()
+            and (licenses_path / f"{key}.txt").exists()
+        ):
+            unchanged.append(key)
+        else:
+            outdated.append(dist)
+
+    with ThreadPoolExecutor(
+        max_workers=workers or os.cpu_count() or 4,
+        thread_name_prefix="LicenseCollector",
+    ) as executor:
+        updated = list(executor.map(extract, outdated))
+    for collected in updated:
+        _write(licenses_path, collected)
+        cache[collected.key] = {"version": collected.version}
+
+    removed = sorted(set(cache) - set(distributions))
+    for key in removed:
+        for suffix in (".json", ".txt"):
+            (licenses_path / f"{key}{suffix}").unlink(missing_ok=True)
+        del cache[key]
+
+    cache_path.write_text(
+        json.dumps({"version": _CACHE_VERSION, "distributions": cache}),
+        encoding="utf-8",
+    )
+    return [collected.key for collected in updated], unchanged, removed
+
+
+def main(licenses_path: Path, exclude: Iterable[str] = ()) -> None:
+    """Collect the licenses and print what changed."""
+    updated, unchanged, removed = collect_licenses(licenses_path, exclude)
+    for key in updated:
+        print(f"Collected {key}")
+    for key in removed:
+        print(f"Removed {key}")
+    print(
+        f"{len(updated)} updated, {len(unchanged)} unchanged, "
+        f"{len(removed)} removed"
+    )
@@ -0,0 +1,289 @@
+"""
+Driver of `pyqt-utils --profile-startup`.
+
+Launches a package several times with `python -X importtime -m <package>`,
+cold (without any cached bytecode) and warm, and collects the startup
+milestones and init phases recorded by `pyqt_utils.startup_profile` in the
+child processes. The aggregated report ranks slow imports and phases and
+can be compared against a previously saved report.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+ENV_VAR = "PYQT_UTILS_STARTUP_PROFILE"
+MODES = ("cold", "warm")
+# Milestone compared against the baseline.
+GATE_MILESTONE = "ready"
+# Number of imports and phases listed in the printed report.
+REPORT_LIMIT = 20
+
+
+def _parse_importtime(stderr: str) -> dict[str, tuple[float, float]]:
+    """
+    Parse the output of `-X importtime`.
+
+    :return: The self and cumulative import time of every module, in ms.
+    :rtype: dict[str, tuple[float, float]]
+    """
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            # The header line.
+            continue
+        imports[fields[2].strip()] = (self_us / 1000, cumulative_us / 1000)
+    return imports
+
+
+def run_once(
+    package: Path, cold: bool, timeout: float = 60.0
+) -> dict[str, Any]:
+    """
+    Start the package once and wait until it quits.
+
+    :param package: The path to the package.
+    :type package: Path
+    :param cold: Whether to start without any cached bytecode.
+    :type cold: bool
+    :param timeout: Seconds after which the process is killed, defaults to
+    60.0
+    :type timeout: float, optional
+    :return: The milestones and phases in ms and the import times.
+    :rtype: dict[str, Any]
+    """
+    with tempfile.TemporaryDirectory(prefix="pyqt-utils-profile-") as tmp:
+        output = Path(tmp) / "startup.json"
+        env = os.environ.copy()
+        env[ENV_VAR] = str(output)
+        if cold:
+            env["PYTHONPYCACHEPREFIX"] = str(Path(tmp) / "pycache")
+        else:
+            env.pop("PYTHONPYCACHEPREFIX", None)
+        command = [sys.executable, "-X", "importtime", "-m", package.name]
+        launched = time.time()
+        try:
+            process = subprocess.run(
+                command,
+                cwd=package.parent,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+                errors="replace",
+                timeout=timeout,
+            )
+            stderr = process.stderr
+        except subprocess.TimeoutExpired as e:
+            stderr = e.stderr.decode("utf-8", "replace") if e.stderr else ""
+        exited = time.time()
+        if not output.exists():
+            errors = "\n".join(
+                line
+                for line in stderr.splitlines()
+                if not line.startswith("import time:")
+            )
+            raise RuntimeError(
+                f"{package.name} didn't report its startup. Make sure it "
+                f"imports pyqt_utils.\n{errors}".rstrip()
+            )
+        data = json.loads(output.read_text("utf-8"))
+
+    milestones = {
+        name: (timestamp - launched) * 1000
+        for name, timestamp in data["marks"].items()
+    }
+    milestones["exit"] = (exited - launched) * 1000
+    milestones[GATE_MILESTONE] = milestones.get(
+        "first_window_exposed",
+        milestones.get("first_event_loop_iteration", milestones["exit"]),
+    )
+    return {
+        "milestones": milestones,
+        "phases": {
+            name: summary["total"]
+            for name, summary in data["perf"]["histograms"].items()
+        },
+        "imports": _parse_importtime(stderr),
+    }
+
+
+def _summarize(values: list[float]) -> dict[str, float]:
+    return {
+        "median": statistics.median(values),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+def _aggregate(runs: list[dict[str, Any]]) -> dict[str, Any]:
+    result: dict[str, Any] = {}
+    for key in ("milestones", "phases"):
+        names = {name for run in runs for name in run[key]}
+        result[key] = {
+            name: _summarize([run[key].get(name, 0.0) for run in runs])
+            for name in names
+        }
+    modules = {module for run in runs for module in run["imports"]}
+    result["imports"] = {
+        module: {
+            "self": statistics.median(
+                run["imports"].get(module, (0.0, 0.0))[0] for run in runs
+            ),
+            "cumulative": statistics.median(
+                run["imports"].get(module, (0.0, 0.0))[1] for run in runs
+            ),
+        }
+        for module in modules
+    }
+    return result
+
+
+def profile_startup(
+    package: Path, runs: int = 5, timeout: float = 60.0
+) -> dict[str, Any]:
+    """
+    Profile the startup of a package, cold and warm.
+
+    :param package: The path to the package.
+    :type package: Path
+    :param runs: The number of runs per mode, defaults to 5
+    :type runs: int, optional
+    :param timeout: Seconds after which a run is killed, defaults to 60.0
+    :type timeout: float, optional
+    :return: The report.
+    :rtype: dict[str, Any]
+    """
+    report: dict[str, Any] = {
+        "package": package.name,
+        "runs": runs,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "modes": {},
+    }
+    # Makes sure cached bytecode exists for the warm runs.
+    run_once(package, cold=False, timeout=timeout)
+    for mode in MODES:
+        results = [
+            run_once(package, cold=mode == "cold", timeout=timeout)
+            for _ in range(runs)
+        ]
+        report["modes"][mode] = _aggregate(results)
+    return report
+
+
+def format_report(report: dict[str, Any]) -> str:
+    lines = [
+        f"Startup profile of {report['package']} "
+        f"({report['runs']} runs per mode, Python {report['python']})"
+    ]
+    for mode, result in report["modes"].items():
+        lines.append("")
+        lines.append(f"{mode.upper()} (median / min / max ms)")
+        lines.append("  Milestones:")
+        for name, summary in sorted(
+            result["milestones"].items(), key=lambda item: item[1]["median"]
+        ):
+            lines.append(
+                f"    {name:<40} {summary['median']:9.1f} "
+                f"{summary['min']:9.1f} {summary['max']:9.1f}"
+            )
+        lines.append("  Slowest phases:")
+        for name, summary in sorted(
+            result["phases"].items(),
+            key=lambda item: item[1]["median"],
+            reverse=True,
+        )[:REPORT_LIMIT]:
+            lines.append(
+                f"    {name:<40} {summary['median']:9.1f} "
+                f"{summary['min']:9.1f} {summary['max']:9.1f}"
+            )
+        lines.append("  Slowest imports (self / cumulative ms):")
+        for module, times in sorted(
+            result["imports"].items(),
+            key=lambda item: item[1]["self"],
+            reverse=True,
+        )[:REPORT_LIMIT]:
+            lines.append(
+                f"    {module:<40} {times['self']:9.1f} "
+                f"{times['cumulative']:9.1f}"
+            )
+    return "\n".join(lines)
+
+
+def compare(
+    report: dict[str, Any], baseline: dict[str, Any], threshold: float
+) -> list[str]:
+    """
+    Compare the median time until the application is ready against a
+    baseline report.
+
+    :param report: The current report.
+    :type report: dict[str, Any]
+    :param baseline: The baseline report.
+    :type baseline: dict[str, Any]
+    :param threshold: The allowed slowdown in percent.
+    :type threshold: float
+    :return: A description of every regression, empty if there is none.
+    :rtype: list[str]
+    """
+    regressions = []
+    for mode, result in report["modes"].items():
+        try:
+            before = baseline["modes"][mode]["milestones"][GATE_MILESTONE]
+        except KeyError:
+            continue
+        now = result["milestones"][GATE_MILESTONE]["median"]
+        allowed = before["median"] * (1 + threshold / 100)
+        if now > allowed:
+            regressions.append(
+                f"{mode}: {GATE_MILESTONE} after {now:.1f}ms, baseline "
+                f"{before['median']:.1f}ms (+{threshold:g}% allowed)"
+            )
+    return regressions
+
+
+def main(
+    package: Path,
+    runs: int,
+    save: str | None,
+    baseline: str | None,
+    threshold: float,
+) -> int:
+    """
+    Profile, print the report and compare it against the baseline.
+
+    :return: The exit code, 1 if startup regressed.
+    :rtype: int
+    """
+    report = profile_startup(package, runs)
+    print(format_report(report))
+    if save:
+        Path(save).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if baseline:
+        regressions = compare(
+            report,
+            json.loads(Path(baseline).read_text("utf-8")),
+            threshold,
+        )
+        if regressions:
+            print("\nStartup regressed:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo startup regression.")
+    return 0
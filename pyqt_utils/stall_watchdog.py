@@ -0,0 +1,223 @@
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+from PyQt6.QtCore import QCoreApplication, QEvent, QObject
+
+try:
+    from . import config, perf
+except ImportError:
+    import config  # type: ignore[no-redef]
+    import perf  # type: ignore[no-redef]
+
+_HEARTBEAT = QEvent.Type(QEvent.registerEventType())
+
+# Number of different stacks logged per stall.
+MAX_LOGGED_STACKS = 3
+# Number of different stacks counted per stall, further ones are only
+# included in the number of samples.
+MAX_COUNTED_STACKS = 100
+
+
+class _HeartbeatReceiver(QObject):
+    def __init__(self, watchdog: "StallWatchdog") -> None:
+        super().__init__()
+        self.watchdog = watchdog
+
+    def event(self, event: QEvent | None) -> bool:
+        if event is not None and event.type() == _HEARTBEAT:
+            self.watchdog._heartbeat_processed()
+            return True
+        return super().event(event)
+
+
+class StallWatchdog:
+    """
+    Measures how late events are processed by the Qt event loop of the
+    thread that started the watchdog, usually the GUI thread.
+
+    A side thread posts heartbeat events through the event loop. If one
+    isn't processed within `threshold` seconds, the stall and the stack of
+    the GUI thread are logged and flushed right away, so they're on disk
+    even if the frozen application gets killed. The stack is then sampled
+    until the heartbeat is processed, and a summary with the most common
+    stacks is logged when the stall ends. Latency percentiles are logged
+    every `report_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.2,
+        interval: float = 0.05,
+        report_interval: float = 300.0,
+    ) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.report_interval = report_interval
+        self.stalls = 0
+        self._latencies: deque[float] = deque(maxlen=10_000)
+        self._processed = threading.Event()
+        self._processed_at = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._receiver: _HeartbeatReceiver | None = None
+        self._main_ident = 0
+
+    def start(self) -> None:
+        """Start watching the event loop of the calling thread."""
+        if self._thread is not None:
+            return
+        self._receiver = _HeartbeatReceiver(self)
+        self._main_ident = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="StallWatchdog", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._processed.set()
+        self._thread.join()
+        self._thread = None
+
+    def percentiles(self) -> dict[str, float]:
+        """
+        Return percentiles of the recent event loop latencies in
+        milliseconds.
+        """
+        latencies = sorted(self._latencies)
+        if not latencies:
+            return {}
+        percentiles = {}
+        for p in (50, 90, 99):
+            index = min(len(latencies) - 1, len(latencies) * p // 100)
+            percentiles[f"p{p}"] = latencies[index] * 1000
+        percentiles["max"] = latencies[-1] * 1000
+        return percentiles
+
+    def _heartbeat_processed(self) -> None:
+        self._processed_at = time.monotonic()
+        self._processed.set()
+
+    def _sample_stack(self) -> str:
+        frame = sys._current_frames().get(self._main_ident)
+        if frame is None:
+            return ""
+        return "".join(traceback.format_stack(frame))
+
+    def _run(self) -> None:
+        # Heartbeats posted before the event loop runs are only processed
+        # once it starts, so the first one doesn't count.
+        armed = False
+        last_report = time.monotonic()
+        while not self._stop.is_set():
+            if QCoreApplication.instance() is None:
+                self._stop.wait(self.interval)
+                continue
+            self._processed.clear()
+            posted = time.monotonic()
+            QCoreApplication.postEvent(self._receiver, QEvent(_HEARTBEAT))
+            stacks: Counter[str] = Counter()
+            samples = 0
+            while not self._processed.wait(self.interval):
+                if not armed or time.monotonic() - posted < self.threshold:
+                    continue
+                stack = self._sample_stack()
+                if samples == 0:
+                    self._log_stall_started(stack)
+                samples += 1
+                if stack and (
+                    stack in stacks or len(stacks) < MAX_COUNTED_STACKS
+                ):
+                    stacks[stack] += 1
+            if self._stop.is_set():
+                return
+            if not armed:
+                armed = True
+                continue
+            latency = self._processed_at - posted
+            self._latencies.append(latency)
+            perf.observe("watchdog.event_loop_latency", latency * 1000)
+            if latency >= self.threshold:
+                self._log_stall(latency, samples, stacks)
+            if time.monotonic() - last_report >= self.report_interval:
+                last_report = time.monotonic()
+                self._log_latencies()
+            self._stop.wait(self.interval)
+
+    def _log_stall_started(self, stack: str) -> None:
+        self.stalls += 1
+        config.log(
+            f"Event loop stalled for more than {self.threshold * 1000:.0f} "
+            f"ms in:\n{stack.rstrip()}",
+            "WARNING",
+        )
+        config.flush_log()
+
+    def _log_stall(
+        self, latency: float, samples: int, stacks: Counter[str]
+    ) -> None:
+        if not samples:
+            # Ended before the first sample, so it wasn't logged yet.
+            self.stalls += 1
+        lines = [
+            f"Event loop stall ended after {latency * 1000:.0f} ms, "
+            f"{samples} stack samples"
+        ]
+        for stack, count in stacks.most_common(MAX_LOGGED_STACKS):
+            lines.append(f"{count} samples in:\n{stack.rstrip()}")
+        config.log("\n".join(lines), "WARNING")
+
+    def _log_latencies(self) -> None:
+        percentiles = self.percentiles()
+        if not percentiles:
+            return
+        config.log(
+            "Event loop latency: %s, %d stalls",
+            "INFO",
+            ", ".join(f"{k}={v:.1f}ms" for k, v in percentiles.items()),
+            self.stalls,
+        )
+
+
+_watchdog: StallWatchdog | None = None
+
+
+def start_watchdog(
+    threshold: float = 0.2,
+    interval: float = 0.05,
+    report_interval: float = 300.0,
+) -> StallWatchdog:
+    """
+    Start the application wide StallWatchdog for the calling thread, which
+    should be the GUI thread. The QApplication may be created afterwards.
+
+    :param threshold: Seconds an event may wait before it is considered a
+    stall, defaults to 0.2
+    :type threshold: float, optional
+    :param interval: Seconds between heartbeats and between stack samples
+    during a stall, defaults to 0.05
+    :type interval: float, optional
+    :param report_interval: Seconds between logged latency percentiles,
+    defaults to 300.0
+    :type report_interval: float, optional
+    :return: The watchdog.
+    :rtype: StallWatchdog
+    """
+    global _watchdog
+    if _watchdog is None:
+        _watchdog = StallWatchdog(threshold, interval, report_interval)
+        _watchdog.start()
+    return _watchdog
+
+
+def stop_watchdog() -> None:
+    global _watchdog
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
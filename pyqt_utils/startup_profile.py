@@ -0,0 +1,200 @@
+"""
+Runtime side of `pyqt-utils --profile-startup`.
+
+`pyqt_utils` installs this hook on import if the PYQT_UTILS_STARTUP_PROFILE
+environment variable names an output file. It enables `perf` so the init
+phases are timed and records the wall-clock time of startup milestones.
+Once the Qt event loop processed its first event and the first window is
+exposed, the results are written to the output file and the application
+quits.
+"""
+
+import atexit
+import functools
+import importlib.abc
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from collections.abc import Sequence
+from importlib.machinery import ModuleSpec
+from types import ModuleType
+from typing import Any
+
+try:
+    from . import perf
+except ImportError:
+    import perf  # type: ignore[no-redef]
+
+ENV_VAR = "PYQT_UTILS_STARTUP_PROFILE"
+# Seconds to wait for a window to be exposed after the first event loop
+# iteration.
+WINDOW_TIMEOUT = 10.0
+# Seconds the application may take to quit after the results were written.
+EXIT_GRACE = 2.0
+
+_marks: dict[str, float] = {}
+_written = False
+_lock = threading.Lock()
+# Keeps the event receiver alive.
+_receiver: Any = None
+# The application classes by module, hooked once the module is imported.
+_APP_CLASSES = {
+    "PyQt6.QtCore": "QCoreApplication",
+    "PyQt6.QtGui": "QGuiApplication",
+    "PyQt6.QtWidgets": "QApplication",
+}
+# The modules whose application class was hooked.
+_hooked: set[str] = set()
+
+
+def mark(name: str) -> None:
+    """
+    Record the current wall-clock time as milestone `name`, unless it was
+    recorded before.
+    """
+    with _lock:
+        _marks.setdefault(name, time.time())
+
+
+def install() -> None:
+    perf.enable(dump_interval=None)
+    mark("pyqt_utils_imported")
+    # For applications that never start an event loop.
+    atexit.register(_write)
+    for module_name, class_name in _APP_CLASSES.items():
+        module = sys.modules.get(module_name)
+        if module is not None:
+            _hook_app_class(getattr(module, class_name))
+    qtcore = sys.modules.get("PyQt6.QtCore")
+    if qtcore is not None and qtcore.QCoreApplication.instance() is not None:
+        _on_app_created()
+    elif len(_hooked) < len(_APP_CLASSES):
+        # Qt isn't imported before the application imports it, so its
+        # import is measured where it happens.
+        sys.meta_path.insert(0, _QtFinder())
+
+
+class _QtFinder(importlib.abc.MetaPathFinder):
+    """Hooks the application classes once their modules are imported."""
+
+    def __init__(self) -> None:
+        self._finding = False
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Sequence[str] | None,
+        target: ModuleType | None = None,
+    ) -> ModuleSpec | None:
+        if fullname not in _APP_CLASSES or self._finding:
+            return None
+        # Finds the spec using the other finders.
+        self._finding = True
+        try:
+            spec = importlib.util.find_spec(fullname)
+        finally:
+            self._finding = False
+        if spec is not None and spec.loader is not None:
+            spec.loader = _QtLoader(spec.loader, self)
+        return spec
+
+
+class _QtLoader(importlib.abc.Loader):
+    def __init__(
+        self, loader: importlib.abc.Loader, finder: _QtFinder
+    ) -> None:
+        self.loader = loader
+        self.finder = finder
+
+    def create_module(self, spec: ModuleSpec) -> ModuleType | None:
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module: ModuleType) -> None:
+        self.loader.exec_module(module)
+        _hook_app_class(getattr(module, _APP_CLASSES[module.__name__]))
+        if len(_hooked) == len(_APP_CLASSES) and self.finder in sys.meta_path:
+            sys.meta_path.remove(self.finder)
+
+
+def _hook_app_class(cls: Any) -> None:
+    """Call `_on_app_created` after an application class is constructed."""
+    _hooked.add(cls.__module__)
+    init = cls.__init__
+
+    @functools.wraps(init)
+    def __init__(self: Any, *args: Any, **kwargs: Any) -> None:
+        init(self, *args, **kwargs)
+        _on_app_created()
+
+    cls.__init__ = __init__
+
+
+def _on_app_created() -> None:
+    global _receiver
+    if _receiver is not None:
+        return
+    mark("qapplication_created")
+    from PyQt6.QtCore import QCoreApplication, QEvent, QObject
+
+    event_type = QEvent.Type(QEvent.registerEventType())
+
+    class Receiver(QObject):
+        def event(self, event: QEvent | None) -> bool:
+            if event is not None and event.type() == event_type:
+                mark("first_event_loop_iteration")
+                _wait_for_window(time.monotonic() + WINDOW_TIMEOUT)
+                return True
+            return super().event(event)
+
+    # Created in the thread of the application, which runs the event loop.
+    _receiver = Receiver()
+    QCoreApplication.postEvent(_receiver, QEvent(event_type))
+
+
+def _wait_for_window(deadline: float) -> None:
+    from PyQt6.QtCore import QTimer
+
+    qtgui = sys.modules.get("PyQt6.QtGui")
+    if qtgui is None or not isinstance(
+        qtgui.QGuiApplication.instance(), qtgui.QGuiApplication
+    ):
+        _finish()
+        return
+    windows = qtgui.QGuiApplication.topLevelWindows()
+    if any(window.isExposed() for window in windows):
+        mark("first_window_exposed")
+        _finish()
+    elif time.monotonic() >= deadline:
+        _finish()
+    else:
+        QTimer.singleShot(5, lambda: _wait_for_window(deadline))
+
+
+def _finish() -> None:
+    from PyQt6.QtCore import QCoreApplication
+
+    _write()
+    threading.Thread(target=_force_exit, daemon=True).start()
+    QCoreApplication.quit()
+
+
+def _force_exit() -> None:
+    # The application may not quit if the event loop that processed the
+    # first event isn't the main one, e.g. while showing a splash screen.
+    time.sleep(EXIT_GRACE)
+    os._exit(0)
+
+
+def _write() -> None:
+    global _written
+    with _lock:
+        if _written:
+            return
+        _written = True
+        marks = dict(_marks)
+    data = {"marks": marks, "perf": perf.stats()}
+    with open(os.environ[ENV_VAR], "w", encoding="utf-8") as fp:
+        json.dump(data, fp)
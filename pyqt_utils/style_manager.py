@@ -0,0 +1,242 @@
+import hashlib
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QApplication
+
+try:
+    from . import config
+    from .styles import (
+        Style,
+        _mtimes_of,
+        find_styles,
+        load_stylesheet_with_sources,
+    )
+except ImportError:
+    import config  # type: ignore[no-redef]
+    from styles import (  # type: ignore[no-redef]
+        Style,
+        _mtimes_of,
+        find_styles,
+        load_stylesheet_with_sources,
+    )
+
+_Loaded = tuple[str, list[Path]]
+# A loaded stylesheet with the modification times of its sources.
+_Preloaded = tuple[str, list[Path], tuple[int, ...]]
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _load_style(style: Style) -> _Loaded:
+    """Return the stylesheet of a style and the files to watch for it."""
+    if style.path is None:
+        return style.stylesheet, []
+    return load_stylesheet_with_sources(style.path)
+
+
+def _preload_style(style: Style) -> _Preloaded:
+    text, sources = _load_style(style)
+    return text, sources, _mtimes_of(sources)
+
+
+class StyleManager(QObject):
+    """
+    Applies styles to the QApplication.
+
+    Stylesheets are loaded in a worker thread, so applying a style never
+    blocks on the disk, and the style after the applied one is preloaded.
+    The files of the applied style are watched: bursts of changes are
+    debounced and the style is only applied again if the stylesheet
+    actually changed. Applying the stylesheet that is already applied does
+    nothing, avoiding a repolish of all widgets.
+
+    `applied` is emitted with the style (or None) after it was applied.
+    """
+
+    applied = pyqtSignal(object)
+    # Emitted from the worker thread with the style, the loaded stylesheet
+    # and its sources, or the exception that occurred while loading.
+    _loaded = pyqtSignal(object, object)
+
+    def __init__(
+        self,
+        styles: Sequence[Style] | None = None,
+        debounce: int = 200,
+        parent: QObject | None = None,
+    ) -> None:
+        """
+        :param styles: The styles to switch between, defaults to all styles
+        found by `find_styles`.
+        :type styles: Sequence[Style] | None, optional
+        :param debounce: Milliseconds to wait for further changes to the
+        files of the applied style before reloading it, defaults to 200
+        :type debounce: int, optional
+        """
+        super().__init__(parent)
+        if styles is None:
+            styles = [
+                style for group in find_styles().values() for style in group
+            ]
+        self.styles = list(styles)
+        self._current: Style | None = None
+        # The style that should be applied once it is loaded.
+        self._requested: Style | None = None
+        self._digest = _digest("")
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="StyleLoader"
+        )
+        self._preloaded: dict[Style, Future[_Preloaded]] = {}
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._watcher.directoryChanged.connect(self._on_file_changed)
+        self._reload_timer = QTimer(self)
+        self._reload_timer.setSingleShot(True)
+        self._reload_timer.setInterval(debounce)
+        self._reload_timer.timeout.connect(self.reload)
+        self._loaded.connect(self._on_loaded)
+        executor = self._executor
+        self.destroyed.connect(
+            lambda: executor.shutdown(wait=False, cancel_futures=True)
+        )
+
+    @property
+    def current(self) -> Style | None:
+        """The applied style."""
+        return self._current
+
+    def next_style(self) -> Style | None:
+        """Return the style after the current one, None without styles."""
+        if not self.styles:
+            return None
+        current = self._current
+        if current is None or current not in self.styles:
+            return self.styles[0]
+        index = self.styles.index(current)
+        return self.styles[(index + 1) % len(self.styles)]
+
+    def apply(self, style: Style | None, wait: bool = False) -> None:
+        """
+        Apply a style to the QApplication, None to remove the stylesheet.
+
+        :param style: The style.
+        :type style: Style | None
+        :param wait: Load the stylesheet in the calling thread unless it was
+        preloaded, e.g. to apply a style before showing the first window,
+        defaults to False
+        :type wait: bool, optional
+        """
+        self._requested = style
+        if style is None:
+            self._set_stylesheet(None, "", [])
+            return
+        preloaded = self._take_preloaded(style)
+        if preloaded is not None:
+            self._on_loaded(style, preloaded)
+        elif wait:
+            try:
+                result: _Loaded | BaseException = _load_style(style)
+            except (OSError, ValueError) as e:
+                result = e
+            self._on_loaded(style, result)
+        else:
+            self._load(style)
+
+    def apply_next(self, wait: bool = False) -> None:
+        """Apply the style after the current one."""
+        style = self.next_style()
+        if style is not None:
+            self.apply(style, wait)
+
+    def preload(self, style: Style) -> None:
+        """Load a stylesheet in the background, so applying it is instant."""
+        if style not in self._preloaded:
+            self._preloaded[style] = self._executor.submit(
+                _preload_style, style
+            )
+
+    def _take_preloaded(self, style: Style) -> _Loaded | None:
+        """
+        Return the preloaded stylesheet of a style, unless it isn't loaded
+        yet, failed to load or one of its sources changed since.
+        """
+        future = self._preloaded.pop(style, None)
+        if future is None or not future.done() or future.exception():
+            return None
+        text, sources, mtimes = future.result()
+        if _mtimes_of(sources) != mtimes:
+            return None
+        return text, sources
+
+    def reload(self) -> None:
+        """Load the current style again and apply it if it changed."""
+        self._preloaded.clear()
+        if self._current is not None and self._requested == self._current:
+            self._load(self._current)
+
+    def _load(self, style: Style) -> None:
+        def load() -> None:
+            try:
+                result: _Loaded | BaseException = _load_style(style)
+            except (OSError, ValueError) as e:
+                result = e
+            self._loaded.emit(style, result)
+
+        self._executor.submit(load)
+
+    def _on_loaded(
+        self, style: Style, result: _Loaded | BaseException
+    ) -> None:
+        if style != self._requested:
+            # Another style was applied in the meantime.
+            return
+        if isinstance(result, BaseException):
+            config.log(
+                f"Failed to load the stylesheet of {style.name}: {result}",
+                "ERROR",
+            )
+            return
+        text, sources = result
+        self._set_stylesheet(style, text, sources)
+        next_style = self.next_style()
+        if next_style is not None and next_style != style:
+            self.preload(next_style)
+
+    def _set_stylesheet(
+        self, style: Style | None, text: str, sources: list[Path]
+    ) -> None:
+        changed = style != self._current
+        self._current = style
+        self._watch(sources)
+        digest = _digest(text)
+        if digest != self._digest:
+            app = QApplication.instance()
+            if isinstance(app, QApplication):
+                app.setStyleSheet(text)
+            self._digest = digest
+            changed = True
+        if changed:
+            self.applied.emit(style)
+
+    def _watch(self, sources: list[Path]) -> None:
+        paths = {str(source) for source in sources}
+        # Editors often save by replacing files, the directories are
+        # watched to notice files being created again.
+        paths |= {str(source.parent) for source in sources}
+        watched = set(self._watcher.files()) | set(
+            self._watcher.directories()
+        )
+        if watched - paths:
+            self._watcher.removePaths(list(watched - paths))
+        missing = [
+            path for path in paths - watched if Path(path).exists()
+        ]
+        if missing:
+            self._watcher.addPaths(missing)
+
+    def _on_file_changed(self, path: str) -> None:
+        self._reload_timer.start()
@@ -1,37 +1,433 @@
-from typing import NamedTuple
+import functools
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, NamedTuple
 
 try:
-    from .paths import STYLES_PATH
+    from . import config, paths, perf
 except ImportError:
-    from paths import STYLES_PATH  # type: ignore[no-redef]
+    import config  # type: ignore[no-redef]
+    import paths  # type: ignore[no-redef]
+    import perf  # type: ignore[no-redef]
 
+# Number of stylesheets kept in memory.
+STYLESHEET_CACHE_SIZE = 8
+# Increased whenever the format of the style index changes.
+_INDEX_VERSION = 1
 
-class Style(NamedTuple):
+_STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+_COMMENT_RE = re.compile(rf"({_STRING})|/\*.*?\*/", re.DOTALL)
+_IMPORT_RE = re.compile(
+    r"@import\s+(?:url\(\s*)?(?:\"([^\"]*)\"|'([^']*)')\s*\)?\s*;"
+)
+# Strings and URLs are kept as they are.
+_PROTECTED_RE = re.compile(rf"{_STRING}|url\([^)]*\)")
+_PLACEHOLDER_RE = re.compile("\x00(\\d+)\x00")
+_RULE_RE = re.compile(r"([^{}]*)\{([^{}]*)\}")
+_DEFINITION_RE = re.compile(r"@([A-Za-z_][\w-]*)\s*:\s*([^;{}]*);")
+_VARIABLE_RE = re.compile(r"@([A-Za-z_][\w-]*)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_index: dict[str, Any] | None = None
+_styles: dict[str, list["Style"]] = {}
+# Stylesheets compiled at runtime by path, with the modification times of
+# their sources.
+_compiled: OrderedDict[Path, tuple[tuple[int, ...], str, list[Path]]] = (
+    OrderedDict()
+)
+_compiled_lock = threading.Lock()
+
+
+class _Style(NamedTuple):
     name: str
-    stylesheet: str
+    stylesheet: str | None
+
+
+class Style(_Style):
+    """
+    A `(name, stylesheet)` tuple. Styles found by `find_styles` only know
+    the path of their stylesheet, it's loaded when the stylesheet is first
+    accessed, by attribute, index or unpacking. See `load_stylesheet`.
+    """
+
+    # The source stylesheet, None if the stylesheet was given.
+    path: Path | None = None
+
+    def __new__(
+        cls,
+        name: str,
+        stylesheet: str | None = None,
+        path: Path | None = None,
+    ) -> "Style":
+        if stylesheet is None and path is None:
+            raise ValueError("Either a stylesheet or a path is required")
+        style = super().__new__(cls, name, stylesheet)
+        style.path = path
+        return style
+
+    @property
+    def stylesheet(self) -> str:
+        text: str | None = tuple.__getitem__(self, 1)
+        if text is None:
+            assert self.path is not None
+            text = load_stylesheet(self.path)
+        return text
+
+    def __iter__(self) -> Iterator[str]:
+        yield self.name
+        yield self.stylesheet
+
+    def __getitem__(self, index: Any) -> Any:
+        return tuple(self)[index]
+
+
+def compiled_path(path: Path) -> Path:
+    """
+    Return the path of the compiled form of a stylesheet, e.g.
+    styles/group/cache/dark.qss for styles/group/dark/stylesheet.qss.
+    """
+    return path.parent.parent / "cache" / f"{path.parent.name}.qss"
+
+
+def load_stylesheet(path: Path) -> str:
+    """
+    Return the compiled form of a stylesheet written by `compile_styles`.
+    If it doesn't exist or is older than one of its sources, the stylesheet
+    is compiled in memory. If it can't be compiled, the source is returned
+    as it is.
+
+    :param path: The path of the source stylesheet.
+    :type path: Path
+    :return: The compiled stylesheet.
+    :rtype: str
+    """
+    return load_stylesheet_with_sources(path)[0]
+
+
+def load_stylesheet_with_sources(path: Path) -> tuple[str, list[Path]]:
+    """
+    Like `load_stylesheet`, but also return the files the stylesheet was
+    compiled from.
+
+    :param path: The path of the source stylesheet.
+    :type path: Path
+    :return: The compiled stylesheet and its sources.
+    :rtype: tuple[str, list[Path]]
+    """
+    cache = compiled_path(path)
+    try:
+        cache_mtime = cache.stat().st_mtime_ns
+        text, deps = _read_compiled(cache, cache_mtime)
+        if all(dep.stat().st_mtime_ns <= cache_mtime for dep in deps):
+            return text, list(deps)
+    except (OSError, ValueError):
+        pass
+    return _compile_in_memory(path)
+
+
+def _mtimes_of(sources: list[Path]) -> tuple[int, ...]:
+    mtimes = []
+    for source in sources:
+        try:
+            mtimes.append(source.stat().st_mtime_ns)
+        except OSError:
+            mtimes.append(-1)
+    return tuple(mtimes)
+
+
+def _compile_in_memory(path: Path) -> tuple[str, list[Path]]:
+    """
+    Compile a stylesheet that wasn't compiled in advance. The result is
+    kept in memory only, as the application directory may not be writable.
+    """
+    with _compiled_lock:
+        entry = _compiled.get(path)
+        if entry is not None and entry[0] == _mtimes_of(entry[2]):
+            _compiled.move_to_end(path)
+            return entry[1], list(entry[2])
+    try:
+        text, deps = compile_stylesheet(path)
+    except (OSError, ValueError) as e:
+        # Qt is more forgiving than the compiler.
+        config.log(f"Using {path} uncompiled: {e}", "WARNING")
+        text, deps = path.read_text(encoding="utf-8"), [path]
+    with _compiled_lock:
+        _compiled[path] = (_mtimes_of(deps), text, deps)
+        _compiled.move_to_end(path)
+        while len(_compiled) > STYLESHEET_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return text, list(deps)
+
+
+@functools.lru_cache(maxsize=STYLESHEET_CACHE_SIZE)
+def _read_compiled(
+    cache: Path, mtime_ns: int
+) -> tuple[str, tuple[Path, ...]]:
+    deps = json.loads(
+        cache.with_suffix(".deps").read_text(encoding="utf-8")
+    )
+    return (
+        cache.read_text(encoding="utf-8"),
+        tuple(cache.parent / dep for dep in deps),
+    )
+
+
+def _write_compiled(path: Path, text: str, deps: list[Path]) -> bool:
+    cache = compiled_path(path)
+    # Written first, a compiled stylesheet is never used with the
+    # dependencies of an older version.
+    return _write_text(
+        cache.with_suffix(".deps"),
+        json.dumps([os.path.relpath(dep, cache.parent) for dep in deps]),
+    ) and _write_text(cache, text)
+
+
+@perf.timed("styles.compile_stylesheet")
+def compile_stylesheet(path: Path) -> tuple[str, list[Path]]:
+    """
+    Compile a stylesheet:
+
+    - `@import "file.qss";` is replaced by the compiled contents of the
+    file, relative to the importing file.
+    - `@name: value;` outside of rules defines a variable, `@name` within
+    declarations is replaced by its value. Later definitions take
+    precedence. Undefined variables and anything within strings or
+    `url(...)` are kept as they are.
+    - Comments and unnecessary whitespace are removed.
+    - If a rule declares a property multiple times, the last declaration is
+    kept. Of identical rules, only the last one is kept.
+
+    :param path: The path of the stylesheet.
+    :type path: Path
+    :raises ValueError: If the stylesheet can't be parsed, imports itself
+    or a variable references itself.
+    :return: The compiled stylesheet and all files it was compiled from.
+    :rtype: tuple[str, list[Path]]
+    """
+    deps: list[Path] = []
+    text = _expand_imports(path, [], deps)
+    strings: list[str] = []
+
+    def protect(match: re.Match[str]) -> str:
+        strings.append(match.group())
+        return f"\x00{len(strings) - 1}\x00"
+
+    # Keeps strings and URLs from being interpreted as QSS.
+    text = _PROTECTED_RE.sub(protect, text)
+    definitions: dict[str, str] = {}
+
+    def define(match: re.Match[str]) -> str:
+        definitions[match[1]] = match[2].strip()
+        return ""
+
+    rules: list[tuple[str, str]] = []
+    end = 0
+    for match in _RULE_RE.finditer(text):
+        rules.append((_DEFINITION_RE.sub(define, match[1]), match[2]))
+        end = match.end()
+    trailing = _DEFINITION_RE.sub(define, text[end:])
+    if trailing.strip():
+        raise ValueError(f"Unexpected {trailing.strip()[:40]!r} in {path}")
+
+    def resolve(value: str, stack: tuple[str, ...]) -> str:
+        def replace(match: re.Match[str]) -> str:
+            name = match[1]
+            if name not in definitions:
+                return match[0]
+            if name in stack:
+                raise ValueError(f"Variable @{name} references itself")
+            return resolve(definitions[name], stack + (name,))
+
+        return _VARIABLE_RE.sub(replace, value)
+
+    compiled: list[str] = []
+    for selector, body in rules:
+        declarations: dict[str, str] = {}
+        for declaration in body.split(";"):
+            prop, colon, value = declaration.partition(":")
+            prop = prop.strip()
+            if not colon or not prop:
+                continue
+            # Keeps the last declaration, at its position.
+            declarations.pop(prop, None)
+            declarations[prop] = _minify(resolve(value, ()))
+        if declarations:
+            compiled.append(
+                _minify(selector)
+                + "{"
+                + ";".join(f"{p}:{v}" for p, v in declarations.items())
+                + "}"
+            )
+    seen = set()
+    unique = []
+    for rule in reversed(compiled):
+        if rule not in seen:
+            seen.add(rule)
+            unique.append(rule)
+    result = "\n".join(reversed(unique))
+    result = _PLACEHOLDER_RE.sub(lambda m: strings[int(m[1])], result)
+    return result, deps
+
+
+def _expand_imports(path: Path, stack: list[Path], deps: list[Path]) -> str:
+    path = path.resolve()
+    if path in stack:
+        raise ValueError(f"{path} imports itself")
+    if path not in deps:
+        deps.append(path)
+    text = _COMMENT_RE.sub(
+        lambda m: m[1] or "", path.read_text(encoding="utf-8")
+    )
+    return _IMPORT_RE.sub(
+        lambda m: _expand_imports(
+            path.parent / (m[1] if m[1] is not None else m[2]),
+            stack + [path],
+            deps,
+        ),
+        text,
+    )
+
+
+def _minify(text: str) -> str:
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    for char in ",>(":
+        text = text.replace(f"{char} ", char).replace(f" {char}", char)
+    return text.replace(" )", ")")
+
+
+def compile_styles(styles_path: Path | None = None) -> list[Path]:
+    """
+    Compile all stylesheets in the styles directory into the cache folder
+    of their group, so they aren't compiled at runtime.
+
+    :param styles_path: The styles directory, defaults to STYLES_PATH.
+    :type styles_path: Path | None, optional
+    :return: The paths of the compiled stylesheets.
+    :rtype: list[Path]
+    """
+    if styles_path is None:
+        styles_path = paths.STYLES_PATH
+    written = []
+    for path in sorted(styles_path.glob("*/*/stylesheet.qss")):
+        if "cache" in path.parent.name:
+            continue
+        text, deps = compile_stylesheet(path)
+        if not _write_compiled(path, text, deps):
+            raise OSError(f"Failed to write {compiled_path(path)}")
+        written.append(compiled_path(path))
+    return written
 
 
+@perf.timed("styles.find_styles")
 def find_styles() -> dict[str, list[Style]]:
     """
-    Recursively find all styles in the styles directory.
+    Recursively find all styles in the styles directory. The stylesheets
+    are only read when accessed. The result of the scan is cached in the
+    LIB_DIR and reused as long as no style is added, renamed or removed.
 
     :return: A list of all styles and (sub-)categories of styles.
     :rtype: list[Style | list[Style]]
     """
-    styles: dict[str, list[Style]] = {}
-    for item in sorted(STYLES_PATH.iterdir()):
+    global _index, _styles
+    index = _index if _index is not None else _load_index()
+    if index is None or not _is_current(index):
+        index = _scan()
+        _save_index(index)
+    if index is not _index:
+        _index = index
+        _styles = {
+            group: [
+                Style(name, path=paths.STYLES_PATH / relative_path)
+                for name, relative_path in styles
+            ]
+            for group, styles in index["styles"].items()
+        }
+    return {group: list(styles) for group, styles in _styles.items()}
+
+
+def _index_path() -> Path:
+    return paths.LIB_DIR / "style_index.json"
+
+
+def _mtimes(groups: list[str]) -> dict[str, int] | None:
+    """
+    Return the modification times of the styles directory (as "") and the
+    given group directories, which change whenever a style is added,
+    renamed or removed. None if a directory doesn't exist anymore.
+    """
+    try:
+        mtimes = {"": paths.STYLES_PATH.stat().st_mtime_ns}
+        for group in groups:
+            mtimes[group] = (paths.STYLES_PATH / group).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return mtimes
+
+
+def _is_current(index: dict[str, Any]) -> bool:
+    return (
+        index.get("version") == _INDEX_VERSION
+        and index.get("root") == str(paths.STYLES_PATH)
+        and index.get("mtimes") == _mtimes(list(index["styles"]))
+    )
+
+
+def _scan() -> dict[str, Any]:
+    styles: dict[str, list[tuple[str, str]]] = {}
+    # Taken before scanning so changes during the scan cause a rescan.
+    root_mtime = paths.STYLES_PATH.stat().st_mtime_ns
+    mtimes = {"": root_mtime}
+    for item in sorted(paths.STYLES_PATH.iterdir()):
         if item.is_dir():
             group_name = item.name
+            mtimes[group_name] = item.stat().st_mtime_ns
             styles[group_name] = []
             for sub_theme in sorted(item.iterdir()):
                 if sub_theme.is_file() or "cache" in sub_theme.name:
                     continue
                 theme_name = sub_theme.name.replace("-", " ").title()
-                style = Style(
-                    name=f"{group_name.title()} {theme_name}",
-                    stylesheet=(sub_theme / "stylesheet.qss").read_text(
-                        encoding="utf-8"
-                    ),
+                styles[group_name].append(
+                    (
+                        f"{group_name.title()} {theme_name}",
+                        f"{group_name}/{sub_theme.name}/stylesheet.qss",
+                    )
                 )
-                styles[group_name].append(style)
-    return styles
+    return {
+        "version": _INDEX_VERSION,
+        "root": str(paths.STYLES_PATH),
+        "mtimes": mtimes,
+        "styles": styles,
+    }
+
+
+def _load_index() -> dict[str, Any] | None:
+    try:
+        index: dict[str, Any] = json.loads(
+            _index_path().read_text(encoding="utf-8")
+        )
+    except (OSError, ValueError):
+        return None
+    return index
+
+
+def _save_index(index: dict[str, Any]) -> None:
+    # The index is only a cache, the LIB_DIR isn't created for it.
+    if paths.LIB_DIR.is_dir():
+        _write_text(_index_path(), json.dumps(index))
+
+
+def _write_text(path: Path, text: str) -> bool:
+    """
+    Write a cache file readable by everyone, creating its directory.
+    Returns whether it succeeded.
+    """
+    try:
+        path.parent.mkdir(exist_ok=True)
+    except OSError:
+        return False
+    return config._write_atomic(path, text, mode=0o644, best_effort=True)
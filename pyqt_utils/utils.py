@@ -12,7 +12,7 @@ except ImportError:
 
 def open_url(url: str) -> None:
     thread = Thread(target=_open_url_threaded, args=(url,))
-    config.log(f"Opening url {url} in thread {thread.name}", "DEBUG")
+    config.log("Opening url %s in thread %s", "DEBUG", url, thread.name)
     thread.start()
 
 
@@ -29,7 +29,9 @@ def _open_url_threaded(url: str) -> None:
 
 def open_file(path: str | Path) -> None:
     thread = Thread(target=_open_file_threaded, args=(path,))
-    config.log(f"Opening file at path {path} in thread {thread.name}", "DEBUG")
+    config.log(
+        "Opening file at path %s in thread %s", "DEBUG", path, thread.name
+    )
     thread.start()
 
 
@@ -1,9 +1,27 @@
 try:
-    from .paths import VERSION_PATH
+    from . import paths
 except ImportError:
-    from paths import VERSION_PATH  # type: ignore[no-redef]
+    import paths  # type: ignore[no-redef]
 
-version_string = VERSION_PATH.read_text(
-    encoding="utf-8"
-).splitlines()[0].strip()
-__version__: tuple[int, ...] = tuple(map(int, version_string.split(".")))
+# Both are read from the version file on first access and cached afterwards.
+version_string: str
+__version__: tuple[int, ...]
+
+
+def _version_string() -> str:
+    if "version_string" not in globals():
+        globals()["version_string"] = paths.VERSION_PATH.read_text(
+            encoding="utf-8"
+        ).splitlines()[0].strip()
+    value: str = globals()["version_string"]
+    return value
+
+
+def __getattr__(name: str) -> object:
+    if name == "version_string":
+        return _version_string()
+    if name == "__version__":
+        value = tuple(map(int, _version_string().split(".")))
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
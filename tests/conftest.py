@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+import textwrap
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+from PyQt6.QtCore import QCoreApplication
+
+from pyqt_utils import config, init_app, paths
+
+REPO_PATH = Path(__file__).resolve().parent.parent
+APP_NAME = "PyQtUtilsTest"
+
+RunProcess = Callable[[str], str]
+
+
+def reset_config() -> None:
+    """Stop the config writer and forget the cached config."""
+    config._shutdown_writer()
+    if config._watcher is not None:
+        config._watcher.deleteLater()
+    connection = getattr(config._store, "_connection", None)
+    if connection is not None:
+        connection.close()
+    config._config = None
+    config._generation = 0
+    config._written_generation = 0
+    config._serialized = None
+    config._dirty_keys = set()
+    config._signature = None
+    config._watcher = None
+    config._stale = False
+    config._listeners.clear()
+    config._changes.clear()
+    config._store = config._JsonStore()
+
+
+@pytest.fixture
+def app_root(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Iterator[Path]:
+    """
+    Initialize pyqt_utils with an application in a temporary directory,
+    storing its config in a temporary home directory.
+    """
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    monkeypatch.setenv("APPDATA", str(tmp_path / "data"))
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path / "local"))
+    root = tmp_path / "app"
+    root.mkdir()
+    (root / "version.txt").write_text("1.0.0\n", encoding="utf-8")
+    init_app(APP_NAME, str(root / "main.py"))
+    for name in paths._RESOLVERS:
+        vars(paths).pop(name, None)
+    yield root
+    reset_config()
+
+
+@pytest.fixture(scope="session")
+def qapp() -> QCoreApplication:
+    """The QCoreApplication, shared by all tests needing one."""
+    app = QCoreApplication.instance()
+    if app is None:
+        app = QCoreApplication([])
+    return app
+
+
+@pytest.fixture
+def run_process(app_root: Path) -> RunProcess:
+    """
+    Return a function running Python code in another process using the
+    same application and config directory. `init_app` is called before.
+    Returns the output of the code.
+    """
+
+    def run(code: str) -> str:
+        prelude = (
+            "from pyqt_utils import init_app\n"
+            f"init_app({APP_NAME!r}, {str(app_root / 'main.py')!r})\n"
+        )
+        process = subprocess.run(
+            [sys.executable, "-c", prelude + textwrap.dedent(code)],
+            env={**os.environ, "PYTHONPATH": str(REPO_PATH)},
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert process.returncode == 0, process.stderr
+        return process.stdout
+
+    return run
@@ -0,0 +1,462 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pytest
+from conftest import RunProcess, reset_config
+
+from pyqt_utils import config, paths
+
+DEFAULTS: dict[str, Any] = {"a": 0, "b": 0, "items": []}
+
+
+def read_config_file() -> dict[str, Any]:
+    data: dict[str, Any] = json.loads(
+        paths.CONFIG_PATH.read_text(encoding="utf-8")
+    )
+    return data
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out"
+        time.sleep(0.01)
+
+
+def count_writes(monkeypatch: pytest.MonkeyPatch) -> list[Any]:
+    """Record everything written by the config store."""
+    writes: list[Any] = []
+    write = config._store.write
+
+    def counting_write(data: Any, compact: bool) -> None:
+        writes.append(data)
+        write(data, compact)
+
+    monkeypatch.setattr(config._store, "write", counting_write)
+    return writes
+
+
+def test_reads_are_served_from_memory(
+    app_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config.init_config(DEFAULTS)
+    loads: list[None] = []
+
+    def counting_load() -> dict[str, Any]:
+        loads.append(None)
+        return {}
+
+    monkeypatch.setattr(config._store, "load", counting_load)
+    for _ in range(100):
+        assert config.get_config_value("a") == 0
+    assert loads == []
+
+
+def test_returned_values_are_copies(app_root: Path) -> None:
+    config.init_config(DEFAULTS)
+    config.get_config_value("items").append(1)
+    assert config.get_config_value("items") == []
+
+
+def test_burst_of_changes_is_written_once(
+    app_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config.init_config(DEFAULTS, write_delay=0.2)
+    writes = count_writes(monkeypatch)
+    for i in range(20):
+        config.set_config_value("a", i)
+    assert read_config_file()["a"] == 0
+    wait_for(lambda: bool(writes))
+    time.sleep(0.3)
+    assert len(writes) == 1
+    assert read_config_file()["a"] == 19
+
+
+def test_failed_write_keeps_the_file_and_is_retried(
+    app_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config.init_config(DEFAULTS, write_delay=60)
+    config.set_config_value("a", 1)
+
+    def failing_replace(src: Any, dst: Any) -> None:
+        raise OSError("Disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(os, "replace", failing_replace)
+        config.flush_config()
+    assert read_config_file()["a"] == 0
+    assert list(paths.CONFIG_DIR.glob("*.tmp")) == []
+    config.flush_config()
+    assert read_config_file()["a"] == 1
+
+
+def test_pending_changes_are_written_on_exit(
+    app_root: Path, run_process: RunProcess
+) -> None:
+    run_process(
+        """
+        from pyqt_utils import config
+        config.init_config({"a": 0}, write_delay=60)
+        config.set_config_value("a", 1)
+        """
+    )
+    assert read_config_file()["a"] == 1
+
+
+def test_transaction_is_written_once(
+    app_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config.init_config(DEFAULTS, write_delay=60)
+    writes = count_writes(monkeypatch)
+    with config.transaction():
+        config.set_config_value("a", 1)
+        config.set_config_values({"b": 2, "items": [3]})
+        assert config.get_config_value("a") == 1
+    config.flush_config()
+    assert len(writes) == 1
+    assert read_config_file() == {"a": 1, "b": 2, "items": [3]}
+
+
+def test_transaction_is_discarded_on_exception(app_root: Path) -> None:
+    config.init_config(DEFAULTS)
+    config.add_config_listener(lambda key, value: pytest.fail(key))
+    with pytest.raises(RuntimeError):
+        with config.transaction():
+            config.set_config_value("a", 1)
+            raise RuntimeError
+    assert config.get_config_value("a") == 0
+    config.flush_config()
+    assert read_config_file()["a"] == 0
+
+
+def test_nested_transactions_are_merged(app_root: Path) -> None:
+    config.init_config(DEFAULTS)
+    with config.transaction():
+        config.set_config_value("a", 1)
+        with config.transaction():
+            config.set_config_value("b", 2)
+        assert config.get_config_value("b") == 2
+        assert read_config_file()["b"] == 0
+    config.flush_config()
+    assert read_config_file()["a"] == 1
+    assert read_config_file()["b"] == 2
+
+
+def test_transaction_is_private_to_its_thread(app_root: Path) -> None:
+    config.init_config(DEFAULTS)
+    seen: list[Any] = []
+    with config.transaction():
+        config.set_config_value("a", 1)
+        thread = threading.Thread(
+            target=lambda: seen.append(config.get_config_value("a"))
+        )
+        thread.start()
+        thread.join()
+    assert seen == [0]
+    assert config.get_config_value("a") == 1
+
+
+def test_failed_batch_is_rolled_back(app_root: Path) -> None:
+    config.init_config(DEFAULTS, write_delay=60)
+    changes: list[tuple[str, Any]] = []
+    config.add_config_listener(lambda key, value: changes.append((key, value)))
+    with pytest.raises(TypeError):
+        config.set_config_values({"a": 1, "b": object()})
+    assert config.get_config_value("a") == 0
+    assert config.get_config_value("b") == 0
+    assert changes == []
+    assert not config._is_dirty()
+
+
+def test_failed_transaction_commit_is_rolled_back(app_root: Path) -> None:
+    config.init_config(DEFAULTS, write_delay=60)
+    with pytest.raises(TypeError):
+        with config.transaction():
+            config.set_config_value("a", 1)
+            config.set_config_value("new", object())
+    assert config.get_config_value("a") == 0
+    with pytest.raises(KeyError):
+        config.get_config_value("new")
+    config.set_config_value("b", 2)
+    config.flush_config()
+    assert read_config_file() == {"a": 0, "b": 2, "items": []}
+
+
+def test_external_changes_are_picked_up(
+    app_root: Path, run_process: RunProcess
+) -> None:
+    config.init_config(DEFAULTS)
+    run_process(
+        """
+        from pyqt_utils import config
+        config.init_config({"a": 0, "b": 0, "items": []})
+        config.set_config_value("b", 2)
+        """
+    )
+    assert config.get_config_value("b") == 2
+
+
+def test_pending_changes_are_merged_with_external_ones(
+    app_root: Path, run_process: RunProcess
+) -> None:
+    config.init_config(DEFAULTS, write_delay=60)
+    config.set_config_value("a", 1)
+    run_process(
+        """
+        from pyqt_utils import config
+        config.init_config({"a": 0, "b": 0, "items": []})
+        config.set_config_value("b", 2)
+        """
+    )
+    config.flush_config()
+    assert read_config_file() == {"a": 1, "b": 2, "items": []}
+    assert config.get_config_value("b") == 2
+
+
+def test_concurrent_processes_keep_each_others_changes(
+    app_root: Path, run_process: RunProcess
+) -> None:
+    keys = [f"key{i}" for i in range(4)]
+    config.init_config(dict.fromkeys(keys, 0))
+    code = """
+        from pyqt_utils import config
+        config.init_config(dict.fromkeys({keys!r}, 0), write_delay=0.001)
+        for i in range(1, 51):
+            config.set_config_value({key!r}, i)
+    """
+    with ThreadPoolExecutor(len(keys)) as executor:
+        list(
+            executor.map(
+                lambda key: run_process(code.format(keys=keys, key=key)),
+                keys,
+            )
+        )
+    assert read_config_file() == dict.fromkeys(keys, 50)
+
+
+def test_journal_is_replayed(app_root: Path) -> None:
+    config.init_config(DEFAULTS, backend="journal")
+    config.set_config_value("a", 1)
+    config.set_config_values({"b": 2, "items": [3]})
+    config.flush_config()
+    assert read_config_file() == DEFAULTS
+    assert paths.CONFIG_JOURNAL_PATH.read_text(encoding="utf-8")
+    reset_config()
+    config.init_config(DEFAULTS, backend="journal")
+    assert config.get_config_value("a") == 1
+    assert config.get_config_value("b") == 2
+    assert config.get_config_value("items") == [3]
+
+
+def test_journal_writes_only_changed_keys(app_root: Path) -> None:
+    config.init_config(DEFAULTS, backend="journal")
+    config.set_config_value("a", 1)
+    config.flush_config()
+    config.set_config_value("b", 2)
+    config.flush_config()
+    lines = paths.CONFIG_JOURNAL_PATH.read_text(encoding="utf-8")
+    key = config._JournalStore.SEQUENCE_KEY
+    assert [json.loads(line) for line in lines.splitlines()] == [
+        {key: 1, "a": 1},
+        {key: 2, "b": 2},
+    ]
+
+
+def test_journal_is_compacted(app_root: Path) -> None:
+    config.init_config(DEFAULTS, backend="journal", journal_limit=64)
+    for i in range(1, 21):
+        config.set_config_value("a", i)
+        config.flush_config()
+        assert paths.CONFIG_JOURNAL_PATH.stat().st_size < 64 + 16
+    assert read_config_file()["a"] > 1
+    reset_config()
+    config.init_config(DEFAULTS, backend="journal", journal_limit=64)
+    assert config.get_config_value("a") == 20
+
+
+def test_journal_is_merged_by_json_backend(app_root: Path) -> None:
+    config.init_config(DEFAULTS, backend="journal")
+    config.set_config_value("a", 1)
+    config.flush_config()
+    reset_config()
+    config.init_config(DEFAULTS)
+    assert not paths.CONFIG_JOURNAL_PATH.exists()
+    assert read_config_file()["a"] == 1
+
+
+def test_damaged_journal_record_is_skipped(app_root: Path) -> None:
+    config.init_config(DEFAULTS, backend="journal")
+    reset_config()
+    paths.CONFIG_JOURNAL_PATH.write_bytes(b'{"a": 1}\n{"a": 2')
+    config.init_config(DEFAULTS, backend="journal")
+    assert config.get_config_value("a") == 1
+    config.set_config_value("b", 5)
+    config.flush_config()
+    assert paths.CONFIG_JOURNAL_PATH.read_bytes() == (
+        b'{"a": 1}\n{"a": 2\n{"__journal_sequence__": 1, "b": 5}\n'
+    )
+    reset_config()
+    config.init_config(DEFAULTS, backend="journal")
+    assert config.get_config_value("a") == 1
+    assert config.get_config_value("b") == 5
+
+
+def test_interrupted_compaction_keeps_newer_values(
+    app_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config.init_config(DEFAULTS, backend="journal", journal_limit=1)
+    config.set_config_value("a", 1)
+    config.flush_config()
+    config.set_config_value("a", 2)
+    write_atomic = config._write_atomic
+
+    def crashing_write_atomic(path: Path, text: str) -> None:
+        if path == paths.CONFIG_JOURNAL_PATH:
+            raise OSError("Crashed")
+        write_atomic(path, text)
+
+    with monkeypatch.context() as m:
+        m.setattr(config, "_write_atomic", crashing_write_atomic)
+        config.flush_config()
+        assert read_config_file()["a"] == 2
+        assert b'"a": 1' in paths.CONFIG_JOURNAL_PATH.read_bytes()
+        reset_config()
+    config.init_config(DEFAULTS, backend="journal", journal_limit=1)
+    assert config.get_config_value("a") == 2
+    config.set_config_value("b", 3)
+    config.flush_config()
+    reset_config()
+    config.init_config(DEFAULTS, backend="journal")
+    assert config.get_config_value("a") == 2
+    assert config.get_config_value("b") == 3
+
+
+def test_journal_is_reconciled_with_defaults(app_root: Path) -> None:
+    config.init_config(DEFAULTS, backend="journal")
+    reset_config()
+    paths.CONFIG_JOURNAL_PATH.write_text(
+        '{"removed": 1, "a": 2}\n', encoding="utf-8"
+    )
+    config.init_config({**DEFAULTS, "added": 3}, backend="journal")
+    assert config.get_config_value("a") == 2
+    assert config.get_config_value("added") == 3
+    with pytest.raises(KeyError):
+        config.get_config_value("removed")
+
+
+def read_database() -> dict[str, Any]:
+    connection = sqlite3.connect(paths.CONFIG_DB_PATH)
+    try:
+        rows = connection.execute("SELECT key, value FROM config")
+        return {key: json.loads(value) for key, value in rows}
+    finally:
+        connection.close()
+
+
+def test_config_is_migrated_to_sqlite(app_root: Path) -> None:
+    config.init_config(DEFAULTS)
+    config.set_config_value("a", 1)
+    config.flush_config()
+    reset_config()
+    paths.CONFIG_JOURNAL_PATH.write_text('{"b": 2}\n', encoding="utf-8")
+    config.init_config(DEFAULTS, backend="sqlite")
+    assert config.get_config_value("a") == 1
+    assert config.get_config_value("b") == 2
+    assert not paths.CONFIG_PATH.exists()
+    assert not paths.CONFIG_JOURNAL_PATH.exists()
+    backup = paths.CONFIG_PATH.with_name(paths.CONFIG_PATH.name + ".bak")
+    assert json.loads(backup.read_text(encoding="utf-8"))["a"] == 1
+    assert read_database() == {"a": 1, "b": 2, "items": []}
+
+
+def test_sqlite_writes_only_changed_keys(
+    app_root: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config.init_config(DEFAULTS, backend="sqlite", write_delay=60)
+    writes = count_writes(monkeypatch)
+    config.set_config_value("a", 1)
+    config.flush_config()
+    assert writes == [[("a", "1")]]
+    assert read_database() == {"a": 1}
+
+
+def test_sqlite_falls_back_to_defaults(app_root: Path) -> None:
+    config.init_config(DEFAULTS, backend="sqlite")
+    config.set_config_value("a", 1)
+    config.flush_config()
+    reset_config()
+    config.init_config({**DEFAULTS, "b": 2}, backend="sqlite")
+    assert config.get_config_value("a") == 1
+    assert config.get_config_value("b") == 2
+    assert config.get_config_value("items") == []
+
+
+def test_sqlite_picks_up_external_changes(
+    app_root: Path, run_process: RunProcess
+) -> None:
+    config.init_config(DEFAULTS, backend="sqlite", write_delay=60)
+    assert config.get_config_value("b") == 0
+    config.set_config_value("a", 1)
+    run_process(
+        """
+        from pyqt_utils import config
+        config.init_config({"a": 0, "b": 0, "items": []}, backend="sqlite")
+        config.set_config_value("b", 2)
+        """
+    )
+    assert config.get_config_value("b") == 2
+    config.flush_config()
+    assert read_database() == {"a": 1, "b": 2}
+
+
+def test_listeners_are_only_called_for_changes(app_root: Path) -> None:
+    config.init_config(DEFAULTS)
+    changes: list[tuple[str, Any]] = []
+    config.add_config_listener(lambda key, value: changes.append((key, value)))
+    config.set_config_value("a", 0)
+    config.set_config_value("a", 1)
+    config.set_config_value("a", 1)
+    config.set_config_values({"a": 1, "b": 2, "items": []})
+    with config.transaction():
+        config.set_config_value("b", 3)
+        config.set_config_value("b", 2)
+    assert changes == [("a", 1), ("b", 2)]
+
+
+def test_listeners_are_called_for_external_changes(
+    app_root: Path, run_process: RunProcess
+) -> None:
+    config.init_config(DEFAULTS)
+    changes: list[tuple[str, Any]] = []
+    config.add_config_listener(lambda key, value: changes.append((key, value)))
+    run_process(
+        """
+        from pyqt_utils import config
+        config.init_config({"a": 0, "b": 0, "items": []})
+        config.set_config_values({"a": 0, "b": 2})
+        """
+    )
+    config.refresh_config()
+    config.refresh_config()
+    assert changes == [("b", 2)]
+
+
+def test_removed_listeners_are_not_called(app_root: Path) -> None:
+    config.init_config(DEFAULTS)
+    changes: list[tuple[str, Any]] = []
+
+    def listener(key: str, value: Any) -> None:
+        changes.append((key, value))
+
+    config.add_config_listener(listener)
+    config.remove_config_listener(listener)
+    config.remove_config_listener(listener)
+    config.set_config_value("a", 1)
+    assert changes == []
@@ -0,0 +1,110 @@
+import gc
+import weakref
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from conftest import RunProcess
+from PyQt6 import sip
+from PyQt6.QtCore import QCoreApplication, QObject
+
+from pyqt_utils import config
+from pyqt_utils.config_notifier import ConfigNotifier
+
+DEFAULTS: dict[str, Any] = {"a": 0, "b": 0}
+
+
+class Subscriber(QObject):
+    def __init__(self) -> None:
+        super().__init__()
+        self.values: list[Any] = []
+
+    def on_changed(self, value: Any) -> None:
+        self.values.append(value)
+
+
+@pytest.fixture
+def notifier(
+    app_root: Path, qapp: QCoreApplication
+) -> Iterator[ConfigNotifier]:
+    config.init_config(DEFAULTS)
+    notifier = ConfigNotifier()
+    yield notifier
+    sip.delete(notifier)
+
+
+def test_changed_is_emitted_once_per_change(notifier: ConfigNotifier) -> None:
+    changes: list[tuple[str, Any]] = []
+    notifier.changed.connect(lambda key, value: changes.append((key, value)))
+    config.set_config_value("a", 1)
+    config.set_config_value("a", 1)
+    config.set_config_values({"a": 1, "b": 0})
+    assert changes == [("a", 1)]
+
+
+def test_subscribers_only_get_their_key(notifier: ConfigNotifier) -> None:
+    subscriber = Subscriber()
+    notifier.subscribe("a", subscriber.on_changed)
+    config.set_config_value("b", 1)
+    config.set_config_value("a", 2)
+    config.set_config_value("a", 2)
+    assert subscriber.values == [2]
+    notifier.unsubscribe("a", subscriber.on_changed)
+    config.set_config_value("a", 3)
+    assert subscriber.values == [2]
+
+
+def test_destroyed_subscribers_are_unsubscribed(
+    notifier: ConfigNotifier,
+) -> None:
+    subscriber = Subscriber()
+    notifier.subscribe("a", subscriber.on_changed)
+    sip.delete(subscriber)
+    config.set_config_value("a", 1)
+    assert subscriber.values == []
+
+
+def test_subscribers_can_be_garbage_collected(
+    notifier: ConfigNotifier,
+) -> None:
+    subscriber = Subscriber()
+    notifier.subscribe("a", subscriber.on_changed)
+    ref = weakref.ref(subscriber)
+    del subscriber
+    gc.collect()
+    assert ref() is None
+    config.set_config_value("a", 1)
+    assert notifier._subscribers["a"] == []
+
+
+def test_functions_stay_subscribed(notifier: ConfigNotifier) -> None:
+    values: list[Any] = []
+    notifier.subscribe("a", lambda value: values.append(value))
+    gc.collect()
+    config.set_config_value("a", 1)
+    assert values == [1]
+
+
+def test_destroyed_notifier_stops_listening(notifier: ConfigNotifier) -> None:
+    listeners = len(config._listeners)
+    other = ConfigNotifier()
+    assert len(config._listeners) == listeners + 1
+    sip.delete(other)
+    assert len(config._listeners) == listeners
+
+
+def test_external_changes_are_emitted(
+    notifier: ConfigNotifier, run_process: RunProcess
+) -> None:
+    changes: list[tuple[str, Any]] = []
+    notifier.changed.connect(lambda key, value: changes.append((key, value)))
+    run_process(
+        """
+        from pyqt_utils import config
+        config.init_config({"a": 0, "b": 0})
+        config.set_config_values({"a": 0, "b": 2})
+        """
+    )
+    config.refresh_config()
+    assert changes == [("b", 2)]
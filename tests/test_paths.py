@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from conftest import APP_NAME
+from PyQt6.QtCore import QCoreApplication
+
+from pyqt_utils import paths
+
+
+def forget_paths() -> None:
+    for name in paths._RESOLVERS:
+        vars(paths).pop(name, None)
+
+
+def test_config_dir_ignores_application_name(
+    app_root: Path, qapp: QCoreApplication
+) -> None:
+    data = Path.home().parent / "data"
+    qapp.setOrganizationName("Organization")
+    try:
+        assert paths.CONFIG_DIR == data / APP_NAME
+    finally:
+        qapp.setOrganizationName("")
+
+
+def test_existing_qt_config_dir_is_kept(
+    app_root: Path, qapp: QCoreApplication
+) -> None:
+    data = Path.home().parent / "data"
+    qt_dir = data / "Organization" / qapp.applicationName() / APP_NAME
+    qt_dir.mkdir(parents=True)
+    qapp.setOrganizationName("Organization")
+    try:
+        assert paths.CONFIG_DIR == qt_dir
+        forget_paths()
+        (data / APP_NAME).mkdir()
+        assert paths.CONFIG_DIR == data / APP_NAME
+    finally:
+        qapp.setOrganizationName("")